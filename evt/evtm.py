@@ -1,14 +1,14 @@
 """
 Python translation of Go evtm.go
 Manages scheduling and execution of events, using evtq for the event queue and vrtime for virtual time.
-Thread-safe, supports wallclock mode, external suspension, and event handler dispatch.
+Supports wallclock mode, external suspension, and event handler dispatch; thread safe in external and wallclock modes only (see below).
 
 This logic is built around the EventManager data structure.
 It uses an EventQueue to hold events, which itself uses the vrtime module's Time data structure to hold the values ordered by the EventQueue.
 
 In addition to the usual functionality one expects from an event list:
 - the EventManager has an option of running in 'wallclock' time, which ties the advancement of virtual time to be the same rate (in real-time) as physical time as might be seen on the clock on a wall. This feature has particular utility when the simulation model integrates real devices that participate in the model execution, but are not controlled by the EventManager.
-- access to critical data elements are guarded by mutexes, to enable use in a multi-threaded context
+- in external mode, and while run() is dispatching in wallclock mode, access to critical data elements is guarded by a mutex, so other threads may call schedule(), schedule_simple(), cancel_event() and remove_event(). In the default mode neither the EventManager nor its EventQueue takes a lock, and all calls must come from the thread that calls run(), including from event handlers.
 - all functions whose executions are triggered by the execution of an event have a particular function type declared. The interface specifies the 'context' for the event, through provisioning of a pointer to some struct representing an entity in the model, and provisioning of some 'data' the event handler views as being presented to the event handler for application at that position in the model.
 - there is user-selectable operating mode where if the event list goes empty the thread running the EventManager suspends; the action of (some other thread) scheduling an event reactivates it. This turns out to be needed when simulation is mixed with emulation, the emulation thread is running and needs to complete and possibly cause the scheduling of an event.
 
@@ -18,53 +18,72 @@ The process of executing an event is to (a) identify the event in the EventQueue
 
 After an initial set of events are scheduled, one starts the simulation by calling the EventManager function method Run(LimitTime). Control is returned from this when the least time event in the EventQueue has a time that is strictly larger than LimitTime, or when there are no further events to process in the EventQueue. In the former case the clock of the EventManager is advanced to LimitTime even though no event necessarily took place at that time, in the latter case the EventManager time is left at the time of the least event executed. This design decision makes it possible for one to run the simulation, window of simulation time by window of simulation time, after a window completes loading the event list with events to execute in the next window without needing to dither around with the EventManager clock value. Certain parallel simulation time management protocols work this way, and the design is meant to support that.
 """
+import _thread
+import os
 import threading
 import time as pytime
-# import vrtime
-from evt.vrtime import Time, zero_time, seconds_to_ticks, ticks_to_seconds
+import evt.vrtime as vrtime
+from evt.vrtime import Time, seconds_to_ticks, ticks_to_seconds
 import evt.evtq as evtq
 
-# evtMgrTrace is a flag used while debugging to selectively print/log information
-evtMgrTrace = False
+# evtMgrTrace is a flag used while debugging to selectively print/log information.
+# It can be switched on from the environment by setting EVT_TRACE to anything other than 0.
+# run() and schedule() read it once per call, so changing it takes effect from the next call.
+evtMgrTrace = os.environ.get("EVT_TRACE", "0") not in ("", "0")
+
+# _spinSeconds is the tail of a wallclock delay that is busy-waited rather than slept, to absorb sleep wakeup latency
+_spinSeconds = 100e-6
+
+# eventPoolSize bounds the number of dispatched Events an EventManager keeps for reuse by schedule()
+eventPoolSize = 1024
 
 class Event:
     """
     Event packages up the context and data sensitive information to be included when scheduling an event, and is used in dispatching the event handler.
     Context: opaque information the event handler may need about where and what it is executing.
     Data: information the event handler uses to execute the event, e.g., a message or frame.
-    Time: defines the instant (in the future) when the EventHandler will be called.
+    Time: defines the instant (in the future) when the EventHandler will be called. It is not modified once the event is in the EventQueue, so the EventManager adopts it as its clock without copying.
     EventHandler: the function that is called to handle the event.
     EventID: permanent identifier for this event. It can be used to subsequently access or delete the event.
-    Cancel: flag to mark event as cancelled.
+    Cancel: flag to mark event as cancelled. It is set by EventManager.cancel_event for inspection, but the dispatch loop goes by the EventManager's own record of cancelled ids.
+    Events are recycled by the EventManager once dispatched, so a reference to one should not be held past its execution.
     """
+    # slots are laid out in the order the dispatch loop reads them: Time and EventID decide whether the event runs at all
+    __slots__ = ('Time', 'EventID', 'EventHandler', 'Context', 'Data', 'Cancel')
+
     def __init__(self, context, data, time, handler, event_id=None, cancel=False):
-        self.Context = context
-        self.Data = data
         self.Time = time
+        self.Cancel = cancel
         self.EventHandler = handler  # Callable: (EventManager, context, data) -> any
+        self.Context = context
+        self.Data = data
         self.EventID = event_id
-        self.Cancel = cancel
 
 class EventManager:
     """
     An EventManager structure holds information needed to schedule and execute events.
     It has a pointer to an EventQueue, and a copy of the virtual time of the last event to have been removed from the EventQueue (which is interpreted as the virtual time of that event).
     It has a Boolean flag also which, if changed to false when processing an event, will inhibit the dispatch of further events until the event manager is told to run again.
+    Other threads may schedule, cancel and remove events only when External is set, or while run() is dispatching with Wallclock set;
+    otherwise no lock is taken and the EventManager must be used from a single thread.
     """
     def __init__(self):
-        self.EventList = evtq.EventQueue()  # order events
-        self.Time = zero_time()         # time of last event pulled off the EventList
+        self.EventList = evtq.EventQueue()  # order events; not locked itself, access from other threads is guarded by _lock
+        self.Time = Time(0, 0)         # time of last event pulled off the EventList
         self.EventID = 0               # identifier needed if we aim to remove events from EventList
         self.NumEvts = 0               # number of events executed by the event manager
         self.RunFlag = False           # indicate whether the EventManager is actively in use right now
         self.Wallclock = False         # scale virtual time advance to wallclock time, approximately
         self.StartTime = None          # wallclock time at time of first event
         self.External = False          # if true we don't close up when the event list is empty
-        self._lock = threading.Lock()  # needed for thread safety
+        self._lock = _thread.allocate_lock()  # guards the clock and event list, taken only in external mode or while run() dispatches in wallclock mode
         self.suspended = False         # true when the thread running the EventManager is waiting for a signal sent when an event is scheduled
-        self.suspChan = threading.Event() # used for suspension signaling
+        self._cond = threading.Condition(self._lock) # used for suspension signaling, shares the lock guarding the event list
+        self._threadsafe = False       # true while run() is dispatching in a mode where other threads may touch the EventManager
         self.autoPri = 1               # use when time on event being scheduled has a priority of 0
         self.entryNum = 1
+        self._event_pool = []          # dispatched Event instances kept for reuse by schedule(), at most eventPoolSize of them
+        self._cancelled_ids = set()    # ids of queued events that are not to be dispatched
 
     def set_external(self, external):
         """Set the flag which, when true, puts the EventManager into a mode where if the event list empties before reaching the end simulation time, the thread running the EventManager suspends until the scheduling of an event releases it."""
@@ -74,34 +93,52 @@ class EventManager:
         """Assigns a value to the flag which when true puts the EventManager into a model where it runs in tandem with wallclock time."""
         self.Wallclock = wallclock
 
+    # current_time() and set_time() guard a single attribute read or write, so the lock is taken with explicit
+    # acquire/release calls; for critical sections this short the with-statement protocol costs more than the work.
     def current_time(self):
         """Returns a copy of the simulation's current time."""
-        with self._lock:
+        lock = self._lock
+        lock.acquire()
+        try:
             return self.Time.copy()
+        finally:
+            lock.release()
 
     def set_time(self, new_time):
         """Sets the Event Manager's clock to a specified vrtime."""
-        with self._lock:
+        lock = self._lock
+        lock.acquire()
+        try:
             self.Time = new_time.copy()
+        finally:
+            lock.release()
 
+    # current_seconds() and current_ticks() take no lock: reading self.Time is a single atomic load under the GIL,
+    # and the Time it yields is never modified in place, so its tick count is a consistent snapshot.
+    # Handlers that do arithmetic on the clock should use current_ticks(); current_seconds() converts on every call.
     def current_seconds(self):
         """Gives the time using the seconds units."""
-        with self._lock:
-            return ticks_to_seconds(self.Time.Ticks())
+        return ticks_to_seconds(self.Time.Ticks())
 
     def current_ticks(self):
         """Returns the number of ticks since the EventManager started executing events, at tick 0."""
-        with self._lock:
-            return self.Time.Ticks()
+        return self.Time.Ticks()
 
-    def _real_time_delay(self, current, tgt):
-        """Computes how long the EventManager should sleep now if running wallclock time, and causes it to sleep that long."""
+    def _real_time_delay(self, current_ticks, tgt_ticks):
+        """Computes how long the EventManager should sleep now if running wallclock time, and causes it to sleep that long. Both times are given in ticks."""
         if not self.Wallclock:
             return
-        gap_in_ticks = tgt.Ticks() - current.Ticks()
-        gap_in_seconds = ticks_to_seconds(gap_in_ticks)
-        if gap_in_seconds > 0:
-            pytime.sleep(gap_in_seconds)
+        # this runs once per event in wallclock mode, so the tick to seconds conversion is done inline
+        gap_in_seconds = (tgt_ticks - current_ticks) / vrtime.FloatTicksPerSecond
+        if gap_in_seconds <= 0:
+            return
+        deadline = pytime.perf_counter() + gap_in_seconds
+        # a sleeping thread can wake up late by about as much as the spin window, so sleep through
+        # the bulk of a long gap and busy-wait the remainder to land on the target time
+        if gap_in_seconds > 2 * _spinSeconds:
+            pytime.sleep(gap_in_seconds - _spinSeconds)
+        while pytime.perf_counter() < deadline:
+            pass
 
     def run(self, limit_time):
         """Starts the event dispatch loop for an EventManager that has been inactive. Will stay in this processing loop until (a) there are events in queue, but none with timestamps greater than limit_time, (b) there are no events in queue, or (c) the last event executed set the Event Manager's RunFlag to false. In case (a) the clock of the Event Manager is set to limit_time, in cases (b) and (c) the clock is left at the time of the last event executed."""
@@ -113,109 +150,215 @@ class EventManager:
         self.RunFlag = True
         
         # remember the wallclock time when events started executing
-        self.StartTime = pytime.time()
+        self.StartTime = pytime.perf_counter()
+
+        # another thread can only be touching the EventManager while it runs when it is driven by something
+        # external to the simulation; otherwise the dispatch loop can skip the lock entirely
+        self._threadsafe = self.External or self.Wallclock
+        if self._threadsafe:
+            self._run_locked(limit_ticks)
+        else:
+            self._run_unlocked(limit_ticks)
         
+        # if we fell out of the loop because RunFlag was set to false by an event,
+        # leave the clock of the event manager at the time of the last event executed.
+        # Likewise, if the loop ends because there are no further events, leave the event manager time at the time of the last event executed.
+        # This means we do nothing here.
+        # When the next item in the queue starts beyond the termination time the loop has already set the clock to limit_ticks,
+        # so this only fires when the queue is exhausted, and the dispatch loop is done so the clock can be read without the lock.
+        if self.RunFlag and self.Time.Ticks() < limit_ticks:
+            # The queue is exhausted, so we soak up the remaining time.
+            self.Time = Time(limit_ticks, 0)
+       
+        # falling out of the dispatch loop we know the EventManager isn't running anymore
+        self.EventID = 0
+        self.RunFlag = False
+
+    def _run_locked(self, limit_ticks):
+        """Dispatch loop used in external and wallclock modes, where other threads may schedule events while it runs. Access to the clock and event list is guarded by the lock."""
+        # read the trace flag once, so that with tracing off each trace site is just a test of a local
+        trace = evtMgrTrace
+        # bind the event list methods and other per-iteration lookups once
+        ev_len = self.EventList.Len
+        ev_min_ticks = self.EventList.MinTicks
+        nxt_evt = self._nxt_evt
+        lock = self._lock
+        cond = self._cond
+        cancelled_ids = self._cancelled_ids
+        pool = self._event_pool
+        pool_append = pool.append
+
+        # the clock is only advanced by this loop, so its tick count is tracked as a plain int
+        cur_ticks = self.current_ticks()
+
         entry = True
         # keep working if the RunFlag is true and there are events to dispatch
-        while self.RunFlag and (entry or (self.EventList.Len() > 0 and self.current_ticks() < limit_ticks)):
+        while self.RunFlag and (entry or (ev_len() and cur_ticks < limit_ticks)):
             entry = False
             # nxt_evt pulls off the package associated with the event with least time-stamp and unpacks it
             #   a) context is information the event handler may need about where and what it is executing.
             #   b) data is information the event handler uses to execute the event, e.g., a message or frame.
             #   c) handler is the function to call to handle the event. These all have the signature  func(context, data) -> bool
             #   d) Events are given unique integer id numbers when scheduled, and evt_id returns that of the event being dispatched
-            if self.EventList.Len() > 0:
+            if ev_len() > 0:
                 # "wake up Clyde, we got something to do" (with apologies to JJ Cale)
                 
-                # virtual time when me and Clyde do it
-                nxt_evt_time = self.EventList.MinTime()
-                if evtMgrTrace:
-                    print(f"1. evt len {self.EventList.Len()}, nxtTime {ticks_to_seconds(nxt_evt_time.Ticks())}")
-                if limit_ticks < nxt_evt_time.Ticks():
+                # virtual time when me and Clyde do it, read straight from the queue's heap key
+                nxt_ticks = ev_min_ticks()
+                if trace:
+                    print(f"1. evt len {ev_len()}, nxtTime {ticks_to_seconds(nxt_ticks)}")
+                if limit_ticks < nxt_ticks:
                     self.Time = Time(limit_ticks, 0)
                     break
 
                 # if so configured, hold back this thread to align with the wallclock
                 if self.Wallclock:
-                    self._real_time_delay(self.current_time(), nxt_evt_time)
+                    self._real_time_delay(cur_ticks, nxt_ticks)
                 
                 # get the next event, and call its handling function
-                with self._lock:
-                    event = self._nxt_evt()
-                
-                self.Time = event.Time.copy()       # update the EventManager's clock to be that of the next event
-                self.EventID = event.EventID        # remember the eventId while we can, before the event disappears
+                with lock:
+                    event = nxt_evt()
                 
-                # dispatch the event using the information carried along by the event
-                if not event.Cancel:
+                if cancelled_ids and event.EventID in cancelled_ids:
+                    # a cancelled event is dropped without touching the clock or the current event id
+                    cancelled_ids.discard(event.EventID)
+                else:
+                    self.Time = event.Time              # update the EventManager's clock to be that of the next event
+                    cur_ticks = self.Time.Ticks()
+                    self.EventID = event.EventID        # remember the eventId while we can, before the event disappears
+
+                    # dispatch the event using the information carried along by the event
                     event.EventHandler(self, event.Context, event.Data)
                     self.NumEvts += 1
+
+                # the event is done with, so hand it back for reuse without holding on to its payload
+                if len(pool) < eventPoolSize:
+                    event.Context = event.Data = None
+                    pool_append(event)
                     
             # if configured for external suspension, check if we need to suspend
             if self.External:
-                if evtMgrTrace:
-                    print(f"Checking suspension {self.EventList.Len()}, {self.suspended}, lock {self._lock}")
-                len_flag = False
-
-                # check the length and set suspended with the lock held
-                with self._lock:
-                    if self.EventList.Len() == 0:
-                        len_flag = True
-                        self.suspended = True
-                        if evtMgrTrace:
-                            print("Suspending evtmgr")
-                # release lock, but still wait if list was empty
-                if len_flag:
-                    self.suspChan.wait()  # block on release message
-                    self.suspended = False
+                if trace:
+                    print(f"Checking suspension {ev_len()}, {self.suspended}, lock {self._lock}")
+
+                # only an apparently empty list needs the lock; Len() is a lock-free read. The length is confirmed and the
+                # wait entered with the lock held, and schedule() signals with it held, so a wakeup cannot slip in between
+                # the check and the wait. A stop() while suspended also releases the wait.
+                if ev_len() == 0:
+                    with cond:
+                        while ev_len() == 0 and self.External and self.RunFlag:
+                            self.suspended = True
+                            if trace:
+                                print("Suspending evtmgr")
+                            cond.wait()  # block on release message
+                        self.suspended = False
+
+    def _run_unlocked(self, limit_ticks):
+        """Dispatch loop used when the thread calling run() is the only one touching the EventManager. No lock is taken, and the clock and event list are read directly."""
+        trace = evtMgrTrace
+        # bind everything touched on every iteration once rather than looking it up on each pass
+        ev_len = self.EventList.Len
+        ev_min_ticks = self.EventList.MinTicks
+        ev_pop = self.EventList.Pop
+        pool = self._event_pool
+        pool_append = pool.append
+        cancelled_ids = self._cancelled_ids
+
+        # the clock is only advanced by this loop, so its tick count is tracked as a plain int
+        cur_ticks = self.Time.Ticks()
+
+        # the first pass dispatches regardless of the clock (the 'entry' case of the locked loop),
+        # later passes continue only while the clock is short of the limit
+        while self.RunFlag and ev_len():
+            # virtual time of the next event, read straight from the queue's heap key
+            nxt_ticks = ev_min_ticks()
+            if trace:
+                print(f"1. evt len {ev_len()}, nxtTime {ticks_to_seconds(nxt_ticks)}")
+            if limit_ticks < nxt_ticks:
+                self.Time = Time(limit_ticks, 0)
+                break
+
+            # get the next event, and call its handling function
+            event = ev_pop()
             
-            # in order to see if we're done yet we need to get the time of next event so that it can be compared with a termination time
-            with self._lock:
-                if self.EventList.Len() > 0:
-                    nxt_evt_time = self.EventList.MinTime()
-        
-        
-        # if we fell out of the loop because RunFlag was set to false by an event,
-        # leave the clock of the event manager at the time of the last event executed.
-        # Likewise, if the loop ends because there are no further events, leave the event manager time at the time of the last event executed.
-        # This means we do nothing here.
-        if self.RunFlag and self.current_time().Ticks() < limit_ticks:
-            # Either the queue is exhausted, or the next item in the queue starts beyond the termination time. In either event, we soak up the remaining time.
-            self.Time = Time(limit_ticks, 0)
-       
-        # falling out of the dispatch loop we know the EventManager isn't running anymore
-        self.EventID = 0
-        self.RunFlag = False
+            if cancelled_ids and event.EventID in cancelled_ids:
+                # a cancelled event is dropped without touching the clock or the current event id
+                cancelled_ids.discard(event.EventID)
+            else:
+                self.Time = event.Time              # update the EventManager's clock to be that of the next event
+                cur_ticks = self.Time.Ticks()
+                self.EventID = event.EventID        # remember the eventId while we can, before the event disappears
+
+                # dispatch the event using the information carried along by the event
+                event.EventHandler(self, event.Context, event.Data)
+                self.NumEvts += 1
+
+            # the event is done with, so hand it back for reuse without holding on to its payload
+            if len(pool) < eventPoolSize:
+                event.Context = event.Data = None
+                pool_append(event)
+
+            if cur_ticks >= limit_ticks:
+                break
 
     def stop(self):
         """Stops the event dispatch loop of the EventManager."""
-        self.RunFlag = False
+        # the flag is changed under the lock so that a dispatch thread suspended on an empty event list,
+        # or just about to be, is released and sees it
+        with self._cond:
+            self.RunFlag = False
+            self._cond.notify()
 
     def schedule(self, context, data, handler, offset):
         """Creates a new event and puts it on the EventManager's event queue. Returns the eventId of the new event and the virtual time when the execution will occur."""
+        trace = evtMgrTrace
         eid = self.entryNum
         self.entryNum += 1
 
-        if evtMgrTrace:
+        if trace:
             print(f"enter Schedule entry {eid} with mutex {self._lock}, event time {ticks_to_seconds(self.Time.Plus(offset).Ticks())}")
         
-        # change offset priority if it has a priority of 0
-        if offset.Pri() == 0:
-            offset.SetPri(self.autoPri)
+        # an offset priority of 0 is replaced by the next automatic priority; as Go passes the offset by value,
+        # the caller's offset is left unchanged
+        pri = offset.Pri()
+        if pri == 0:
+            pri = self.autoPri
             self.autoPri += 1
         
-        with self._lock:
-            # time of the last event to be pulled from the EventQueue
-            current_time = self.Time.copy()
-            
-            # this event is offset time in the future
-            new_time = current_time.Plus(offset)
-            
-            # set the priority to be that of the event being scheduled
-            new_time.SetPri(offset.Pri())
-            
-            # bundle together the information needed for event dispatch
-            new_event = Event(context, data, new_time, handler)
+        # this event is offset time in the future of the last event to be pulled from the EventQueue,
+        # with the priority of the event being scheduled; the Time is built directly from the int fields
+        # rather than with Plus and SetPri, whose priority choice and int conversion would be discarded
+        new_time = Time(self.Time.TickCnt + offset.TickCnt, pri)
+        event_id = self._enqueue(context, data, handler, new_time)
+
+        if trace:
+            print(f"Schedule entry {eid} schedules event {event_id} at {ticks_to_seconds(new_time.Ticks())}")
+            print(f"Schedule entry {eid} returns")
+        
+        # return the eventId gotten from EventQueue, and the time of the scheduled event
+        return event_id, new_time.copy()
+
+    def schedule_simple(self, context, data, handler, delay_ticks):
+        """Creates a new event delay_ticks after the current time and puts it on the EventManager's event queue. Equivalent to schedule() with an offset of priority 0, for callers that never choose a priority. Returns the eventId of the new event and the virtual time when the execution will occur."""
+        # the event takes the next automatic priority, as schedule() would give an offset with priority 0
+        new_time = Time(self.Time.TickCnt + delay_ticks, self.autoPri)
+        self.autoPri += 1
+        return self._enqueue(context, data, handler, new_time), new_time.copy()
+
+    def _enqueue(self, context, data, handler, new_time):
+        """Puts an event to be executed at new_time on the EventManager's event queue, waking a suspended dispatch loop if need be. Returns the eventId of the new event."""
+        # the lock is only needed when another thread may be touching the EventManager: in external mode,
+        # or while run() is dispatching in a mode that takes the lock itself
+        need_lock = self.External or (self.RunFlag and self._threadsafe)
+        if need_lock:
+            self._lock.acquire()
+        try:
+            # bundle together the information needed for event dispatch, reusing a dispatched Event if one is available
+            if self._event_pool:
+                new_event = self._event_pool.pop()
+                new_event.Context, new_event.Data, new_event.Time, new_event.EventHandler, new_event.EventID, new_event.Cancel = context, data, new_time, handler, None, False
+            else:
+                new_event = Event(context, data, new_time, handler)
             
             # put the event bundle into the EventQueue with priority equal to the scheduled time, and get in return the unique event id
             event_id = self.EventList.Insert(new_event, new_time)
@@ -223,31 +366,48 @@ class EventManager:
             # new_event just got placed into the EventQueue but we can still get at it and put in the identify of the event that carries it
             new_event.EventID = event_id
             
-            if evtMgrTrace:
-                print(f"Schedule entry {eid} schedules event {event_id} at {ticks_to_seconds(new_time.Ticks())}")
-            
             # we block the thread managing the EventManager if the event list becomes empty, or unblock the thread when it is blocked and this scheduling transitions the event list from being empty to non-empty
             if self.External and self.suspended and self.EventList.Len() == 1:
                 if evtMgrTrace:
                     print("Schedule unsuspends EventManager")
-                self.suspChan.set()
-        
-        if evtMgrTrace:
-            print(f"Schedule entry {eid} returns")
-        
-        # return the eventId gotten from EventQueue, and the time of the scheduled event
-        return event_id, new_time.copy()
+                self._cond.notify()
+        finally:
+            if need_lock:
+                self._lock.release()
+        return event_id
 
     def cancel_event(self, event_id):
         """Cancels the indicated event from the event list."""
-        item = self.EventList.GetItem(event_id)
-        if item is not None:
+        # as in remove_event, the lookup and the flagging race with the dispatch loop unless the lock is held:
+        # it may pop the event in between, and its Item may then be recycled for a different event
+        need_lock = self.External or (self.RunFlag and self._threadsafe)
+        if need_lock:
+            self._lock.acquire()
+        try:
+            item = self.EventList.GetItem(event_id)
+            if item is None or item.Value is None:
+                return False
             item.Value.Cancel = True
-        return item is not None
+            self._cancelled_ids.add(event_id)
+            return True
+        finally:
+            if need_lock:
+                self._lock.release()
 
     def remove_event(self, event_id):
         """Removes the indicated event from the event list, and returns a flag indicating whether the event was found and removed."""
-        return self.EventList.Remove(event_id)
+        # the EventList does no locking of its own, so a removal that may race with the dispatch loop takes the lock
+        need_lock = self.External or (self.RunFlag and self._threadsafe)
+        if need_lock:
+            self._lock.acquire()
+        try:
+            removed = self.EventList.Remove(event_id)
+            if removed:
+                self._cancelled_ids.discard(event_id)
+        finally:
+            if need_lock:
+                self._lock.release()
+        return removed
 
     def _nxt_evt(self):
         """Pulls off the minimum time event from an EventQueue and returns it."""
@@ -3,128 +3,195 @@
 # Event queue implementation using heapq and threading for thread safety
 #
 # Package evtq creates and manages event queues
-# It depends upon Python's heapq to manage a heap structure
+# It depends upon Python's heapq to manage a heap structure; its functions are imported by name, which under
+# CPython binds the C implementations from _heapq directly
 
-import heapq
+import contextlib
+from heapq import heapify, heappop, heappush, heapreplace
 import threading
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import evt.vrtime as vrtime
 
 
 # InvalidEventID will never be returned from EventQueue.Insert()
 InvalidEventID = 0
 
+# noLock stands in for the mutex of an EventQueue that is only used by one thread
+noLock = contextlib.nullcontext()
+
+# itemPoolSize bounds the number of retired Items an EventQueue keeps for reuse
+itemPoolSize = 1024
+
+# _ZERO_TIME is returned by MinTime for an empty queue; it is the shared vrtime.zero_time() constant and,
+# like the Time of a queued event returned by MinTime, must not be modified by the caller
+_ZERO_TIME = vrtime.zero_time()
+
+# compactMinSize is the heap size below which an EventQueue never compacts away its tombstones
+compactMinSize = 64
+
 class Item:
     """
     The item struct defines the item organized by Time value
     itemID: unique identifier with every event inserted into the queue
     Value: completely general payload for the item
     Time: the field used to order the elements
-    index: the position of the item in the (heap-organized) list of events
-    Cancel: has been marked for removal
+    Cancel: has been marked for removal; the item stays in the heap as a tombstone until it reaches the root or the heap is compacted
+    Items leaving the queue are recycled by the EventQueue, so one returned by GetItem should not be held on to.
     """
+    # a queue holds one Item per pending event and tombstone, so they carry no per-instance __dict__
+    __slots__ = ('itemID', 'Value', 'Time', 'Cancel')
+
     def __init__(self, itemID: int, value: Any, time: 'vrtime.Time'):
         self.itemID = itemID
         self.Value = value
         self.Time = time
-        self.index = 0
         self.Cancel = False
 
-    def __lt__(self, other: 'Item'):
-        return self.Time.LT(other.Time)
-
-class ItemHeap:
-    """
-    ItemHeap is the type of the data structure written to satisfy the Heap interface
-    Implements Len, Less, Swap, Push, and Pop required for a type to satisfy the Heap interface
-    """
-    def __init__(self):
-        self.data = []
-
-    def __len__(self):
-        return len(self.data)
-
-    def push(self, item: Item):
-        heapq.heappush(self.data, item)
-
-    def pop(self) -> Item:
-        return heapq.heappop(self.data)
-
-    def fix(self, index: int):
-        heapq.heapify(self.data)
-
-    def get(self, index: int) -> Item:
-        return self.data[index]
-
-    def swap(self, i: int, j: int):
-        self.data[i], self.data[j] = self.data[j], self.data[i]
-        self.data[i].index = i
-        self.data[j].index = j
-
 class EventQueue:
     """
     EventQueue represents the queue
     evtID: monotonically increasing counter used for default secondary time in event Time
-    itemHeap: data structure holding items
-    lookup: event identifier to event, used for marking events to be ignored
+    _heap: heap of (ticks, priority, seq, item) entries, including tombstones of removed and rescheduled items
+    _seq: counter of entries pushed onto _heap
+    lookup: event identifier to event, used for marking events to be ignored; holds exactly the live items
     MaxTime: Largest vrtime.Time value pushed onto to the heap as yet
-    mu: used to support thread safety
+    mu: used to support thread safety, held by the operations that modify the queue; a no-op context unless the queue was created thread safe
+    _pool: retired Items kept for reuse by Insert and UpdateTime, at most itemPoolSize of them
+    _min_time: Time of the item at the root of the heap, or _ZERO_TIME when empty; refreshed by every operation that can change the root
+    autoPriority: whether a priority of -1 is replaced by the event ID on insertion; a class attribute, False only for
+    the queues New(auto_priority=False) returns, whose Insert takes every priority as given
+    The heap is a plain list driven by the heapq functions. The ordering key of each entry is kept inline as the ints
+    of its vrtime.Time, so heapq orders entries with C-level tuple and int comparison and never dereferences an Item
+    or its Time while sifting. seq is unique, keeps equal times in
+    the order they were pushed, and ensures the item itself is never compared.
+    Items marked Cancel are tombstones: they are left where they are and discarded once they reach the root, which is
+    never a tombstone between operations, or when they come to outnumber live items.
     """
-    def __init__(self):
+    autoPriority = True
+
+    def __init__(self, thread_safe: bool = False):
         self.evtID = InvalidEventID
-        self.itemHeap = ItemHeap()
+        self._heap: list = []
+        self._seq = 0
         self.lookup: Dict[int, Item] = {}
-        self.MaxTime = vrtime.zero_time()
-        self.mu = threading.Lock()
+        self.MaxTime = vrtime.Time(0, 0)
+        self.mu = threading.Lock() if thread_safe else noLock
+        self._pool: list = []
+        self._min_time = _ZERO_TIME
 
     @staticmethod
-    def New():
-        """New is a constructor. Initializes an empty list of events"""
+    def New(auto_priority: bool = True):
+        """New is a constructor. Initializes an empty list of events, for use by a single thread.
+        With auto_priority False, a priority of -1 is not replaced by the event ID on Insert."""
+        if not auto_priority:
+            return _ExplicitPriorityQueue()
         return EventQueue()
 
+    @staticmethod
+    def NewThreadSafe():
+        """NewThreadSafe is a constructor. Initializes an empty list of events whose operations are guarded by a mutex"""
+        return EventQueue(thread_safe=True)
+
+    # Len, MinTime and GetItem only read a single attribute or dict entry, which is atomic under the
+    # interpreter lock, so they do not take mu; the value read may be stale by the time it is used
+
     def Len(self) -> int:
         """Len returns the number of elements in the queue."""
-        with self.mu:
-            return len(self.itemHeap)
+        return len(self.lookup)
 
     def MinTime(self) -> 'vrtime.Time':
         """MinTime returns the Time associated with the next event."""
+        return self._min_time
+
+    def MinTicks(self) -> int:
+        """MinTicks returns the tick count of the next event, read from its heap key, or 0 for an empty queue."""
         with self.mu:
-            if len(self.itemHeap) == 0:
-                return vrtime.zero_time()
-            return self.itemHeap.get(0).Time
+            data = self._heap
+            if not data:
+                return 0
+            return data[0][0]
 
     def Insert(self, v: Any, time: 'vrtime.Time') -> int:
         """Insert inserts a new element into the queue. No action is performed on duplicate elements."""
         with self.mu:
-            self.evtID += 1
-
-            # update maximum time of inserted event
-            if self.MaxTime.LT(time):
-                self.MaxTime = time
-
             # if the priority in the time stamp is -1
             # change it to be something monotonically increasing
             # to try to give some determinism for events with the
-            # same tick count when some other priority isn't given
-            if time.Pri() == -1:
-                time.SetPri(int(self.evtID))
-
-            # create an item for insertion
-            newItem = Item(self.evtID, v, time)
+            # same tick count when some other priority isn't given:
+            # the event ID this insertion is about to be given
+            pri = time.Priority
+            if pri == -1:
+                pri = self.evtID + 1
+            return self._insert(v, time, pri)
 
-            self.itemHeap.push(newItem)
-            self.lookup[self.evtID] = newItem
-            return self.evtID
+    def InsertMany(self, pairs: Iterable[Tuple[Any, 'vrtime.Time']]) -> List[int]:
+        """InsertMany inserts each (value, time) pair as Insert would, restoring the heap once at the end. Returns the new event IDs in order."""
+        with self.mu:
+            data = self._heap
+            insert = self._insert
+            append = list.append
+            auto = self.autoPriority
+            ids = []
+            try:
+                for v, time in pairs:
+                    pri = time.Priority
+                    if pri == -1 and auto:
+                        pri = self.evtID + 1
+                    ids.append(insert(v, time, pri, append))
+            finally:
+                # a single O(n) heapify replaces the O(log n) sift of each append; it also runs when pairs raises
+                # partway, as the entries appended by then are in the queue
+                heapify(data)
+                if data:
+                    self._min_time = data[0][3].Time
+            return ids
 
     def Pop(self) -> Optional[Any]:
         """Pop removes the element with the least time from the queue and returns it. In case of an empty queue, returns None."""
         with self.mu:
-            if len(self.itemHeap) == 0:
+            data = self._heap
+            if not data:
                 return None
-            popped = self.itemHeap.pop()
-            self.lookup.pop(popped.itemID, None)
-            return popped.Value
+            popped = heappop(data)[3]
+            del self.lookup[popped.itemID]
+            value = popped.Value
+
+            # retire the item inline, this being the hot path
+            popped.Value = None
+            if len(self._pool) < itemPoolSize:
+                self._pool.append(popped)
+
+            # only fall back to pruning when a tombstone has surfaced at the root
+            if not data:
+                self._min_time = _ZERO_TIME
+            elif data[0][3].Cancel:
+                self._prune()
+            else:
+                self._min_time = data[0][3].Time
+            return value
+
+    def PopBatch(self, k: int) -> List[Any]:
+        """PopBatch removes up to k elements with the least times from the queue and returns them in order, holding the lock once for all of them."""
+        with self.mu:
+            data = self._heap
+            lookup = self.lookup
+            pool = self._pool
+            values = []
+            while data and len(values) < k:
+                popped = heappop(data)[3]
+
+                # tombstones surfacing below the first pop are discarded in the same pass
+                if popped.Cancel:
+                    self._retire(popped)
+                    continue
+                del lookup[popped.itemID]
+                values.append(popped.Value)
+                popped.Value = None
+                if len(pool) < itemPoolSize:
+                    pool.append(popped)
+
+            self._prune()
+            return values
 
     def UpdateTime(self, evtID: int, newTime: vrtime.Time):
         """UpdateTime changes the priority of a given item. If the specified item is not present in the queue, no action is performed."""
@@ -133,14 +200,29 @@ class EventQueue:
 
             if item is None:
                 return
-            
-            item.Time = newTime
-            self.itemHeap.fix(item.index)
+
+            # the root entry can be rekeyed in place: heapreplace sifts the new key down from the
+            # top in one pass, and leaves no tombstone behind
+            data = self._heap
+            if data[0][3] is item:
+                item.Time = newTime
+                self._seq += 1
+                heapreplace(data, (newTime.TickCnt, newTime.Priority, self._seq, item))
+                self._prune()
+                return
+
+            # elsewhere, leave the old entry in the heap as a tombstone and push a replacement under the same event ID
+            item.Cancel = True
+            newItem = self._new_item(evtID, item.Value, newTime)
+            item.Value = None
+            self._seq += 1
+            heappush(data, (newTime.TickCnt, newTime.Priority, self._seq, newItem))
+            self.lookup[evtID] = newItem
+            self._prune()
 
     def GetItem(self, evtID: int) -> Optional[Item]:
         """GetItem returns the item for the given event ID, or None if not present."""
-        with self.mu:
-            return self.lookup.get(evtID)
+        return self.lookup.get(evtID)
 
     def Remove(self, evtID: int) -> bool:
         """Remove an element. Returns True on success."""
@@ -149,12 +231,150 @@ class EventQueue:
             if element is None:
                 return False
             
-            # we're going to push the element to be rid of to the top
-            element.Time = vrtime.zero_time()
-            self.itemHeap.fix(element.index)
+            # mark the element as a tombstone, to be discarded when it reaches the root of the heap
+            element.Cancel = True
+            element.Value = None
+            self.lookup.pop(evtID, None)
+            self._prune()
 
-            # pop it off
-            popped = self.itemHeap.pop()
-            self.lookup.pop(popped.itemID, None)
-            
             return True
+
+    def _insert(self, v: Any, time: 'vrtime.Time', pri: int, push=heappush) -> int:
+        """Gives v the next event ID and an Item ordered by time, with pri in place of its priority, and puts its entry on
+        the heap with push; heappush, or list.append by InsertMany, which restores the heap itself. Updates lookup,
+        MaxTime and the cached minimum, and returns the event ID. The caller holds mu."""
+        self.evtID += 1
+
+        # update maximum time of inserted event; as in Go, with the time as given
+        ticks = time.TickCnt
+        maxTime = self.MaxTime
+        if ticks > maxTime.TickCnt or (ticks == maxTime.TickCnt and time.Priority > maxTime.Priority):
+            self.MaxTime = time
+
+        # as Go passes the Time by value, the caller's Time is left unchanged and the item gets a new one
+        if pri != time.Priority:
+            time = vrtime.Time(ticks, pri)
+
+        # create an item for insertion
+        newItem = self._new_item(self.evtID, v, time)
+        data = self._heap
+        self._seq += 1
+        push(data, (ticks, pri, self._seq, newItem))
+        if data[0][3] is newItem:
+            self._min_time = time
+        self.lookup[self.evtID] = newItem
+        return self.evtID
+
+    def _new_item(self, itemID: int, value: Any, time: 'vrtime.Time') -> Item:
+        """Returns an Item for the given fields, reusing a retired one when available. Called with mu held."""
+        if self._pool:
+            item = self._pool.pop()
+            item.itemID = itemID
+            item.Value = value
+            item.Time = time
+            item.Cancel = False
+            return item
+        return Item(itemID, value, time)
+
+    def _retire(self, item: Item):
+        """Hands an Item that has left the heap back for reuse, dropping its payload. Called with mu held."""
+        item.Value = None
+        if len(self._pool) < itemPoolSize:
+            self._pool.append(item)
+
+    def _prune(self):
+        """Discards tombstones from the root of the heap, so that the root is always a live item, and refreshes _min_time. Called with mu held."""
+        data = self._heap
+        while data and data[0][3].Cancel:
+            self._retire(heappop(data)[3])
+        self._min_time = data[0][3].Time if data else _ZERO_TIME
+
+        # tombstones of far-future events may never reach the root, so once they make up
+        # more than half the heap, filter them all out and rebuild it in O(n)
+        if len(data) > compactMinSize and len(data) > 2 * len(self.lookup):
+            live = []
+            for entry in data:
+                if entry[3].Cancel:
+                    self._retire(entry[3])
+                else:
+                    live.append(entry)
+            heapify(live)
+            data[:] = live
+
+class _ExplicitPriorityQueue(EventQueue):
+    """
+    EventQueue returned by New(auto_priority=False), for callers that always give a real priority. Its Insert uses
+    every priority as given, so a priority of -1 orders before priority 0 rather than being replaced by the event ID.
+    """
+    autoPriority = False
+
+    def Insert(self, v: Any, time: 'vrtime.Time') -> int:
+        """Insert inserts a new element into the queue, with the priority in time used as given."""
+        with self.mu:
+            return self._insert(v, time, time.Priority)
+
+class EventQueueSPSC:
+    """
+    EventQueueSPSC is a bounded first-in first-out queue of events for exactly one producer thread and one consumer thread
+    It is not ordered by time, so it suits dispatch workloads where events are already produced in the order they are to be
+    handled, e.g. a simulation thread handing events to a handler thread, layered on top of an EventQueue.
+    buf: ring of slots, its length a power of two
+    mask: len(buf) - 1, to reduce a position to a slot
+    head: position of the next slot to read; written only by the consumer
+    tail: position of the next slot to write; written only by the producer
+    ready: set by the producer when it has made the queue non-empty, for a consumer blocked in Wait
+    Each index has a single writer and slot and index updates are atomic under the interpreter lock, so Push and Pop take no lock.
+    """
+    def __init__(self, capacity: int = 1024):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.buf: List[Any] = [None] * size
+        self.mask = size - 1
+        self.head = 0
+        self.tail = 0
+        self.ready = threading.Event()
+
+    @staticmethod
+    def New(capacity: int = 1024):
+        """New is a constructor. Initializes an empty ring holding at least capacity events"""
+        return EventQueueSPSC(capacity)
+
+    def Len(self) -> int:
+        """Len returns the number of elements in the queue."""
+        return self.tail - self.head
+
+    def Push(self, v: Any) -> bool:
+        """Push appends v to the queue. Returns False, leaving the queue unchanged, if it is full. Called by the producer only."""
+        tail = self.tail
+        if tail - self.head > self.mask:
+            return False
+
+        # fill the slot before publishing it by advancing tail
+        self.buf[tail & self.mask] = v
+        self.tail = tail + 1
+        if not self.ready.is_set():
+            self.ready.set()
+        return True
+
+    def Pop(self) -> Optional[Any]:
+        """Pop removes the oldest element from the queue and returns it. In case of an empty queue, returns None. Called by the consumer only."""
+        head = self.head
+        if head == self.tail:
+            return None
+        slot = head & self.mask
+        v = self.buf[slot]
+        self.buf[slot] = None
+        self.head = head + 1
+        return v
+
+    def Wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait blocks until the queue is non-empty or timeout seconds have passed. Returns True if the queue is non-empty. Called by the consumer only."""
+        while self.head == self.tail:
+            # clear before re-checking, so that a Push landing between the two is not missed
+            self.ready.clear()
+            if self.head != self.tail:
+                break
+            if not self.ready.wait(timeout):
+                return self.head != self.tail
+        return True
@@ -0,0 +1,211 @@
+# evtq_numba.py: integer-keyed variant of the evtq event queue
+#
+# EventQueueJIT offers the same interface as evtq.EventQueue, but keeps the heap in three parallel int64
+# arrays (ticks, priority, entry sequence number) rather than in a list of Python tuples. The sift-up and
+# sift-down kernels below only touch those arrays, so when numba is installed they are compiled with @njit;
+# numba is optional and not listed in requirements.txt. Without it the same kernels run as ordinary Python
+# functions, which is correct but slower than evtq.EventQueue.
+# EventQueueJIT itself is a Python class: its payloads and id lookup are Python dicts of evtq.Item, so it
+# cannot be called from JIT compiled code. A driver loop that is to be compiled has to call the kernels
+# on its own arrays directly.
+# argsort_events orders whole arrays of event times at once, for bulk work outside the queue.
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+import evt.vrtime as vrtime
+from evt.evtq import _ZERO_TIME, InvalidEventID, Item
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit when numba is not installed: returns the function unchanged."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
+
+
+@njit(cache=True)
+def nq_less(t1, p1, i1, t2, p2, i2):
+    """Reports whether heap key (t1, p1, i1) orders before (t2, p2, i2)."""
+    if t1 != t2:
+        return t1 < t2
+    if p1 != p2:
+        return p1 < p2
+    return i1 < i2
+
+
+@njit(cache=True)
+def nq_push(ticks, pris, ids, n, t, p, i):
+    """Adds key (t, p, i) to the heap held in the first n slots of the arrays, which must have room for it. Returns the new heap size."""
+    pos = n
+    while pos > 0:
+        parent = (pos - 1) >> 1
+        if not nq_less(t, p, i, ticks[parent], pris[parent], ids[parent]):
+            break
+        ticks[pos] = ticks[parent]
+        pris[pos] = pris[parent]
+        ids[pos] = ids[parent]
+        pos = parent
+    ticks[pos] = t
+    pris[pos] = p
+    ids[pos] = i
+    return n + 1
+
+
+@njit(cache=True)
+def nq_pop(ticks, pris, ids, n):
+    """Removes the root from the heap held in the first n slots of the arrays; the caller reads the root first. Returns the new heap size."""
+    n -= 1
+    if n == 0:
+        return 0
+    # sift the last key down from the root
+    t = ticks[n]
+    p = pris[n]
+    i = ids[n]
+    pos = 0
+    child = 1
+    while child < n:
+        right = child + 1
+        if right < n and nq_less(ticks[right], pris[right], ids[right], ticks[child], pris[child], ids[child]):
+            child = right
+        if not nq_less(ticks[child], pris[child], ids[child], t, p, i):
+            break
+        ticks[pos] = ticks[child]
+        pris[pos] = pris[child]
+        ids[pos] = ids[child]
+        pos = child
+        child = 2 * pos + 1
+    ticks[pos] = t
+    pris[pos] = p
+    ids[pos] = i
+    return n
+
+
+@njit(cache=True)
+def argsort_events(ticks, pris):
+    """Returns the indices that order the event times (ticks[i], pris[i]) as vrtime.Time orders them; equal times keep their index order."""
+    # two stable sorts, by the secondary key and then the primary, give the lexicographic order; unlike
+    # packing both keys into one, this needs no 128-bit integers
+    order = np.argsort(pris, kind='mergesort')
+    return order[np.argsort(ticks[order], kind='mergesort')]
+
+
+class EventQueueJIT:
+    """
+    EventQueueJIT is an event queue with the interface of evtq.EventQueue whose heap is kept in int64 arrays
+    evtID: monotonically increasing counter used for default secondary time in event Time
+    ticks, pris, seqs: the heap, as parallel arrays of tick count, priority and entry sequence number
+    n: number of heap slots in use, including tombstones
+    seq: counter of heap entries pushed, used as the last element of the heap key
+    entries: heap entry sequence number to Item
+    lookup: event identifier to event; holds exactly the live items
+    MaxTime: Largest vrtime.Time value pushed onto to the heap as yet
+    As in evtq.EventQueue, removed and rescheduled items are left in the heap as tombstones until they reach the root.
+    The queue does no locking.
+    """
+    def __init__(self, capacity: int = 1024):
+        self.evtID = InvalidEventID
+        self.ticks = np.empty(capacity, dtype=np.int64)
+        self.pris = np.empty(capacity, dtype=np.int64)
+        self.seqs = np.empty(capacity, dtype=np.int64)
+        self.n = 0
+        self.seq = 0
+        self.entries: Dict[int, Item] = {}
+        self.lookup: Dict[int, Item] = {}
+        self.MaxTime = vrtime.Time(0, 0)
+
+    @staticmethod
+    def New():
+        """New is a constructor. Initializes an empty list of events"""
+        return EventQueueJIT()
+
+    def Len(self) -> int:
+        """Len returns the number of elements in the queue."""
+        return len(self.lookup)
+
+    def MinTime(self) -> 'vrtime.Time':
+        """MinTime returns the Time associated with the next event."""
+        if self.n == 0:
+            return _ZERO_TIME
+        return self.entries[int(self.seqs[0])].Time
+
+    def MinTicks(self) -> int:
+        """MinTicks returns the tick count of the next event, read from its heap key, or 0 for an empty queue."""
+        if self.n == 0:
+            return 0
+        return int(self.ticks[0])
+
+    def Insert(self, v: Any, time: 'vrtime.Time') -> int:
+        """Insert inserts a new element into the queue. No action is performed on duplicate elements."""
+        self.evtID += 1
+
+        # update maximum time of inserted event
+        if self.MaxTime.LT(time):
+            self.MaxTime = time
+
+        # as in evtq.EventQueue, a priority of -1 is replaced by the monotonically increasing event id
+        if time.Pri() == -1:
+            time = vrtime.Time(time.TickCnt, self.evtID)
+
+        newItem = Item(self.evtID, v, time)
+        self._push(newItem)
+        self.lookup[self.evtID] = newItem
+        return self.evtID
+
+    def Pop(self) -> Optional[Any]:
+        """Pop removes the element with the least time from the queue and returns it. In case of an empty queue, returns None."""
+        if self.n == 0:
+            return None
+        popped = self.entries.pop(int(self.seqs[0]))
+        self.n = nq_pop(self.ticks, self.pris, self.seqs, self.n)
+        del self.lookup[popped.itemID]
+        self._prune()
+        return popped.Value
+
+    def UpdateTime(self, evtID: int, newTime: vrtime.Time):
+        """UpdateTime changes the priority of a given item. If the specified item is not present in the queue, no action is performed."""
+        item = self.lookup.get(evtID)
+        if item is None:
+            return
+
+        # leave the old entry in the heap as a tombstone and push a replacement under the same event ID
+        item.Cancel = True
+        newItem = Item(evtID, item.Value, newTime)
+        item.Value = None
+        self._push(newItem)
+        self.lookup[evtID] = newItem
+        self._prune()
+
+    def GetItem(self, evtID: int) -> Optional[Item]:
+        """GetItem returns the item for the given event ID, or None if not present."""
+        return self.lookup.get(evtID)
+
+    def Remove(self, evtID: int) -> bool:
+        """Remove an element. Returns True on success."""
+        element = self.lookup.pop(evtID, None)
+        if element is None:
+            return False
+        element.Cancel = True
+        element.Value = None
+        self._prune()
+        return True
+
+    def _push(self, item: Item):
+        """Pushes item onto the heap under a fresh entry sequence number, growing the arrays when they are full."""
+        if self.n == len(self.ticks):
+            capacity = 2 * max(len(self.ticks), 1)
+            self.ticks = np.resize(self.ticks, capacity)
+            self.pris = np.resize(self.pris, capacity)
+            self.seqs = np.resize(self.seqs, capacity)
+        self.seq += 1
+        self.entries[self.seq] = item
+        self.n = nq_push(self.ticks, self.pris, self.seqs, self.n, item.Time.TickCnt, item.Time.Priority, self.seq)
+
+    def _prune(self):
+        """Discards tombstones from the root of the heap, so that the root is always a live item."""
+        while self.n and self.entries[int(self.seqs[0])].Cancel:
+            del self.entries[int(self.seqs[0])]
+            self.n = nq_pop(self.ticks, self.pris, self.seqs, self.n)
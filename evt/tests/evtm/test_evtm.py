@@ -1,6 +1,9 @@
+import sys
+import threading
 import unittest
+import time as pytime
 import evt.evtm as evtm
-from evt.vrtime import Time, ticks_to_seconds
+from evt.vrtime import Time, ticks_to_seconds, seconds_to_ticks, zero_time
 
 class TestEventManager(unittest.TestCase):
     def setUp(self):
@@ -19,6 +22,13 @@ class TestEventManager(unittest.TestCase):
         self.mgr.set_wallclock(False)
         self.assertFalse(self.mgr.Wallclock)
 
+    def test_real_time_delay(self):
+        self.mgr.set_wallclock(True)
+        for gap in (50e-6, 2e-3):
+            start = pytime.perf_counter()
+            self.mgr._real_time_delay(0, seconds_to_ticks(gap))
+            self.assertGreaterEqual(pytime.perf_counter() - start, gap)
+
     def test_current_time_and_set_time(self):
         t = Time(123, 4)
         self.mgr.set_time(t)
@@ -47,6 +57,33 @@ class TestEventManager(unittest.TestCase):
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0], ("ctx", "dat"))
 
+    def test_schedule_simple(self):
+        results = []
+        def handler(mgr, context, data):
+            results.append(data)
+        self.mgr.set_time(Time(100, 0))
+        eid1, t1 = self.mgr.schedule_simple(None, 1, handler, 10)
+        eid2, t2 = self.mgr.schedule(None, 2, handler, Time(10, 0))
+        eid3, t3 = self.mgr.schedule_simple(None, 3, handler, 5)
+        self.assertEqual((t1.Ticks(), t1.Pri()), (110, 1))
+        self.assertEqual((t2.Ticks(), t2.Pri()), (110, 2))
+        self.assertEqual((t3.Ticks(), t3.Pri()), (105, 3))
+        self.mgr.run(ticks_to_seconds(200))
+        self.assertEqual(results, [3, 1, 2])
+
+    def test_initial_times_not_shared(self):
+        self.mgr.Time.SetTicks(7)
+        self.mgr.EventList.MaxTime.SetTicks(9)
+        self.assertEqual(zero_time(), Time(0, 0))
+        self.assertEqual(evtm.evtq.EventQueue().MinTime(), Time(0, 0))
+
+    def test_schedule_leaves_offset_unchanged(self):
+        offset = zero_time()
+        _, t1 = self.mgr.schedule(None, 1, lambda *args: None, offset)
+        _, t2 = self.mgr.schedule(None, 2, lambda *args: None, offset)
+        self.assertEqual((offset.Ticks(), offset.Pri()), (0, 0))
+        self.assertNotEqual(t1.Pri(), t2.Pri())
+
     def test_cancel_event(self):
         results = []
         def handler(mgr, context, data):
@@ -58,6 +95,45 @@ class TestEventManager(unittest.TestCase):
         self.mgr.run(10)
         self.assertEqual(len(results), 0)
 
+    def test_cancel_event_bookkeeping(self):
+        def handler(mgr, context, data):
+            pass
+        self.assertFalse(self.mgr.cancel_event(9999))
+        eid1, _ = self.mgr.schedule("ctx", "dat", handler, Time(5, 1))
+        eid2, _ = self.mgr.schedule("ctx", "dat", handler, Time(6, 1))
+        self.assertTrue(self.mgr.cancel_event(eid1))
+        self.assertTrue(self.mgr.cancel_event(eid2))
+        self.assertTrue(self.mgr.remove_event(eid2))
+        self.mgr.run(10)
+        self.assertEqual(self.mgr.NumEvts, 0)
+        self.assertEqual(len(self.mgr._cancelled_ids), 0)
+
+    def test_cancel_event_while_dispatching(self):
+        # in external mode a producer thread cancels events that the dispatch thread may be popping at the same time
+        evtm.evtMgrTrace = False
+        dispatched = []
+        def handler(mgr, context, data):
+            dispatched.append(data)
+        self.mgr.set_external(True)
+        # switch threads often, so that the dispatch thread gets to run between the steps of cancel_event
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        runner = threading.Thread(target=self.mgr.run, args=(1e6,))
+        runner.start()
+        cancelled = set()
+        try:
+            for i in range(20000):
+                eid, _ = self.mgr.schedule(None, i, handler, Time(1, 0))
+                if self.mgr.cancel_event(eid):
+                    cancelled.add(i)
+        finally:
+            sys.setswitchinterval(interval)
+            self.mgr.stop()
+            runner.join(5)
+        self.assertFalse(runner.is_alive())
+        # an event reported as cancelled is never dispatched
+        self.assertFalse(cancelled & set(dispatched))
+
     def test_remove_event(self):
         def handler(mgr, context, data):
             pass
@@ -68,6 +144,40 @@ class TestEventManager(unittest.TestCase):
         self.mgr.run(10)
         self.assertEqual(self.mgr.EventList.Len(), 0)
 
+    def test_external_suspension(self):
+        results = []
+        def handler(mgr, context, data):
+            results.append(data)
+        def stopper(mgr, context, data):
+            results.append(data)
+            mgr.stop()
+        self.mgr.set_external(True)
+        self.mgr.schedule(None, 1, handler, Time(5, 1))
+        runner = threading.Thread(target=self.mgr.run, args=(1.0,))
+        runner.start()
+        # wait for the event list to drain and the dispatch thread to suspend
+        deadline = pytime.perf_counter() + 5
+        while not self.mgr.suspended and pytime.perf_counter() < deadline:
+            pytime.sleep(0.001)
+        self.assertTrue(self.mgr.suspended)
+        self.mgr.schedule(None, 2, stopper, Time(5, 1))
+        runner.join(5)
+        self.assertFalse(runner.is_alive())
+        self.assertEqual(results, [1, 2])
+
+    def test_stop_while_suspended(self):
+        self.mgr.set_external(True)
+        runner = threading.Thread(target=self.mgr.run, args=(1.0,))
+        runner.start()
+        deadline = pytime.perf_counter() + 5
+        while not self.mgr.suspended and pytime.perf_counter() < deadline:
+            pytime.sleep(0.001)
+        self.assertTrue(self.mgr.suspended)
+        self.mgr.stop()
+        runner.join(5)
+        self.assertFalse(runner.is_alive())
+        self.assertFalse(self.mgr.suspended)
+
     def test_stop(self):
         self.mgr.RunFlag = True
         self.mgr.stop()
@@ -82,6 +192,30 @@ class TestEventManager(unittest.TestCase):
         self.assertEqual(e.EventID, 42)
         self.assertTrue(e.Cancel)
 
+    def test_event_pool_reuse(self):
+        results = []
+        def handler(mgr, context, data):
+            results.append((context, data))
+        self.mgr.schedule("ctx1", "dat1", handler, Time(5, 1))
+        self.mgr.run(10)
+        self.assertEqual(len(self.mgr._event_pool), 1)
+        pooled = self.mgr._event_pool[0]
+        self.assertIsNone(pooled.Context)
+        self.assertIsNone(pooled.Data)
+        eid, _ = self.mgr.schedule("ctx2", "dat2", handler, Time(5, 1))
+        self.assertEqual(len(self.mgr._event_pool), 0)
+        self.assertIs(self.mgr.EventList.GetItem(eid).Value, pooled)
+        self.mgr.run(20)
+        self.assertEqual(results, [("ctx1", "dat1"), ("ctx2", "dat2")])
+
+    def test_event_pool_bounded(self):
+        evtm.evtMgrTrace = False
+        for i in range(evtm.eventPoolSize + 10):
+            self.mgr.schedule_simple(None, i, lambda *args: None, 1)
+        self.mgr.run(ticks_to_seconds(10 * evtm.eventPoolSize))
+        self.assertEqual(self.mgr.NumEvts, evtm.eventPoolSize + 10)
+        self.assertEqual(len(self.mgr._event_pool), evtm.eventPoolSize)
+
     def test_comprehensive_event_flow(self):
         self.mgr.evtMgrTrace = True
         
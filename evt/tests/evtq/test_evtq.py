@@ -1,11 +1,49 @@
+import gc
 import unittest
+import weakref
 import evt.vrtime as vrtime
-from evt.evtq import EventQueue
+import random
+import threading
+import time as pytime
+import evt.evtq as evtq
+from evt.evtq import EventQueue, EventQueueSPSC
+import numpy as np
+from evt.evtq_numba import EventQueueJIT, argsort_events, nq_pop, nq_push
+
+try:
+    import numba
+except ImportError:
+    numba = None
 
 class TestEventQueuePython(unittest.TestCase):
     def setUp(self):
         self.q = EventQueue.New()
 
+    def test_new_thread_safe(self):
+        q = EventQueue.NewThreadSafe()
+        self.assertIsNot(q.mu, self.q.mu)
+        eid = q.Insert("event1", vrtime.seconds_to_time(1.0))
+        # read-only probes do not take the lock: run them from another thread while the lock is held, with a
+        # timeout, so that a probe which does take it fails the test rather than hanging it
+        results = []
+        probe = threading.Thread(target=lambda: results.extend([q.Len(), q.MinTime().Ticks(), q.GetItem(eid).Value]),
+                                 daemon=True)
+        with q.mu:
+            self.assertTrue(q.mu.locked())
+            probe.start()
+            probe.join(timeout=5)
+            self.assertFalse(probe.is_alive(), "read-only probe blocked on the queue lock")
+        self.assertEqual(results, [1, vrtime.seconds_to_ticks(1.0), "event1"])
+        self.assertEqual(q.Pop(), "event1")
+
+    def test_c_heapq(self):
+        try:
+            import _heapq
+        except ImportError:
+            self.skipTest("no C heapq in this interpreter")
+        for name in ("heappush", "heappop", "heapify", "heapreplace"):
+            self.assertIs(getattr(evtq, name), getattr(_heapq, name))
+
     def test_insert_and_len(self):
         t1 = vrtime.seconds_to_time(1.0)
         t2 = vrtime.seconds_to_time(2.0)
@@ -21,6 +59,28 @@ class TestEventQueuePython(unittest.TestCase):
         min_time = self.q.MinTime()
         self.assertEqual(min_time.Ticks(), t1.Ticks())
 
+    def test_min_time_empty(self):
+        self.assertEqual(self.q.MinTime().Ticks(), 0)
+        self.assertIs(self.q.MinTime(), EventQueue.New().MinTime())
+        self.q.Insert("event1", vrtime.create_time(10, 1))
+        self.q.Pop()
+        self.assertEqual(self.q.MinTime().Ticks(), 0)
+
+    def test_min_ticks(self):
+        self.assertEqual(self.q.MinTicks(), 0)
+        self.q.Insert("event1", vrtime.create_time(20, 1))
+        self.q.Insert("event2", vrtime.create_time(10, 5))
+        self.assertEqual(self.q.MinTicks(), 10)
+        self.assertEqual(self.q.MinTicks(), self.q.MinTime().Ticks())
+
+    def test_max_time(self):
+        self.q.Insert("event1", vrtime.create_time(10, 2))
+        self.q.Insert("event2", vrtime.create_time(10, 1))
+        self.assertEqual((self.q.MaxTime.Ticks(), self.q.MaxTime.Pri()), (10, 2))
+        self.q.Insert("event3", vrtime.create_time(10, 3))
+        self.q.Insert("event4", vrtime.create_time(5, 9))
+        self.assertEqual((self.q.MaxTime.Ticks(), self.q.MaxTime.Pri()), (10, 3))
+
     def test_pop(self):
         t1 = vrtime.seconds_to_time(1.0)
         t2 = vrtime.seconds_to_time(2.0)
@@ -38,6 +98,38 @@ class TestEventQueuePython(unittest.TestCase):
         min_time = self.q.MinTime()
         self.assertEqual(min_time.Ticks(), t2.Ticks())
 
+    def test_update_time_repeated(self):
+        t1 = vrtime.create_time(10, 1)
+        t2 = vrtime.create_time(20, 1)
+        eid = self.q.Insert("event1", t1)
+        self.q.Insert("event2", vrtime.create_time(15, 1))
+        self.q.UpdateTime(eid, t2)
+        self.q.UpdateTime(eid, t1)
+        self.q.UpdateTime(eid, t1)
+        self.assertEqual(self.q.Len(), 2)
+        self.assertEqual(self.q.GetItem(eid).Time.Ticks(), 10)
+        self.assertEqual([self.q.Pop(), self.q.Pop()], ["event1", "event2"])
+        self.assertEqual(self.q.Len(), 0)
+        self.assertIsNone(self.q.Pop())
+
+    def test_update_time_root(self):
+        eid = self.q.Insert("event1", vrtime.create_time(10, 1))
+        self.q.Insert("event2", vrtime.create_time(15, 1))
+        item = self.q.GetItem(eid)
+        self.q.UpdateTime(eid, vrtime.create_time(20, 1))
+        # the root is rekeyed in place rather than leaving a tombstone
+        self.assertIs(self.q.GetItem(eid), item)
+        self.assertEqual(len(self.q._heap), 2)
+        self.assertEqual(self.q.MinTicks(), 15)
+        self.q.UpdateTime(eid, vrtime.create_time(15, 1))
+        self.assertEqual([self.q.Pop(), self.q.Pop()], ["event2", "event1"])
+        # a tombstone sifted up to the root by the rekeying is discarded
+        eid = self.q.Insert("event3", vrtime.create_time(30, 1))
+        self.assertTrue(self.q.Remove(self.q.Insert("event4", vrtime.create_time(35, 1))))
+        self.q.UpdateTime(eid, vrtime.create_time(40, 1))
+        self.assertEqual(self.q.MinTicks(), 40)
+        self.assertEqual(len(self.q._heap), 1)
+
     def test_remove(self):
         t1 = vrtime.seconds_to_time(1.0)
         t2 = vrtime.seconds_to_time(2.0)
@@ -46,6 +138,21 @@ class TestEventQueuePython(unittest.TestCase):
         removed = self.q.Remove(eid)
         self.assertTrue(removed)
         self.assertEqual(self.q.Len(), 1)
+        self.assertEqual(self.q.MinTime().Ticks(), t2.Ticks())
+        self.assertFalse(self.q.Remove(eid))
+
+    def test_remove_compacts_tombstones(self):
+        first = self.q.Insert("first", vrtime.create_time(1, 1))
+        ids = [self.q.Insert(i, vrtime.create_time(1000 + i, 1)) for i in range(200)]
+        # none of these tombstones reach the root, so only compaction can discard them
+        for eid in ids[:150]:
+            self.assertTrue(self.q.Remove(eid))
+        self.assertEqual(self.q.Len(), 51)
+        self.assertLessEqual(len(self.q._heap), 2 * self.q.Len())
+        self.assertEqual(self.q.Pop(), "first")
+        self.assertEqual([self.q.Pop() for _ in range(50)], list(range(150, 200)))
+        self.assertEqual(len(self.q._heap), 0)
+        self.assertIsNone(self.q.GetItem(first))
 
     def test_get_item(self):
         t1 = vrtime.seconds_to_time(1.0)
@@ -54,5 +161,211 @@ class TestEventQueuePython(unittest.TestCase):
         self.assertIsNotNone(item)
         self.assertEqual(item.Value, "event1")
 
+    def test_pop_order(self):
+        self.q.Insert("c", vrtime.create_time(5, 2))
+        self.q.Insert("a", vrtime.create_time(3, 7))
+        self.q.Insert("b", vrtime.create_time(5, 1))
+        # equal times come out in insertion order
+        self.q.Insert("d", vrtime.create_time(5, 2))
+        self.assertEqual([self.q.Pop() for _ in range(4)], ["a", "b", "c", "d"])
+        self.assertIsNone(self.q.Pop())
+
+    def test_pop_batch(self):
+        ids = [self.q.Insert(i, vrtime.create_time(10 * i, 1)) for i in range(10)]
+        self.q.Remove(ids[2])
+        self.q.Remove(ids[3])
+        self.q.Remove(ids[6])
+        self.assertEqual(self.q.PopBatch(4), [0, 1, 4, 5])
+        self.assertEqual(self.q.Len(), 3)
+        self.assertEqual(self.q.MinTicks(), 70)
+        self.assertEqual(self.q.MinTime().Ticks(), 70)
+        self.assertEqual(self.q.PopBatch(10), [7, 8, 9])
+        self.assertEqual(self.q.PopBatch(3), [])
+        self.assertEqual(len(self.q._heap), 0)
+
+    def test_insert_explicit_priority(self):
+        self.assertEqual(self.q.GetItem(self.q.Insert("auto", vrtime.create_time(5, -1))).Time.Pri(), 1)
+        q = EventQueue.New(auto_priority=False)
+        q.Insert("b", vrtime.create_time(5, 0))
+        eid = q.Insert("a", vrtime.create_time(5, -1))
+        self.assertEqual(q.GetItem(eid).Time.Pri(), -1)
+        self.assertEqual(q.Len(), 2)
+        self.assertEqual([q.Pop(), q.Pop()], ["a", "b"])
+        eid, = q.InsertMany([("c", vrtime.create_time(5, -1))])
+        self.assertEqual(q.GetItem(eid).Time.Pri(), -1)
+        # the specialized Insert comes from a subclass, so the queue holds no reference cycle and is freed at once
+        self.assertIsInstance(q, EventQueue)
+        self.assertNotIn("Insert", vars(q))
+        ref = weakref.ref(q)
+        gc.disable()
+        try:
+            del q
+            self.assertIsNone(ref())
+        finally:
+            gc.enable()
+
+    def test_insert_leaves_time_unchanged(self):
+        t = vrtime.create_time(5, -1)
+        eid = self.q.Insert("a", t)
+        eid2, = self.q.InsertMany([("b", t)])
+        self.assertEqual(t.Pri(), -1)
+        self.assertEqual(self.q.GetItem(eid).Time.Pri(), eid)
+        self.assertEqual(self.q.GetItem(eid2).Time.Pri(), eid2)
+        self.assertEqual({t: "a"}[vrtime.create_time(5, -1)], "a")
+
+    def test_insert_many_error(self):
+        for t in (30, 40, 50):
+            self.q.Insert(t, vrtime.create_time(t, 1))
+        def pairs():
+            yield "b", vrtime.create_time(20, 1)
+            yield "a", vrtime.create_time(10, 1)
+            raise ValueError("bad pair")
+        with self.assertRaises(ValueError):
+            self.q.InsertMany(pairs())
+        # the pairs given before the error were inserted, and the heap was restored
+        self.assertEqual(self.q.MinTime().Ticks(), 10)
+        self.assertEqual([self.q.Pop() for _ in range(5)], ["a", "b", 30, 40, 50])
+
+    def test_insert_many(self):
+        self.q.Insert("b", vrtime.create_time(5, 1))
+        ids = self.q.InsertMany([("d", vrtime.create_time(9, 1)),
+                                 ("a", vrtime.create_time(2, 3)),
+                                 ("c", vrtime.create_time(5, -1))])
+        self.assertEqual(ids, [2, 3, 4])
+        self.assertEqual(self.q.Len(), 4)
+        self.assertEqual(self.q.GetItem(4).Time.Pri(), 4)
+        self.assertEqual(self.q.MaxTime.Ticks(), 9)
+        self.assertEqual(self.q.MinTime().Ticks(), 2)
+        self.assertEqual([self.q.Pop() for _ in range(4)], ["a", "b", "c", "d"])
+        self.assertEqual(self.q.InsertMany([]), [])
+
+    def test_item_reuse(self):
+        eid = self.q.Insert("event1", vrtime.create_time(10, 1))
+        item = self.q.GetItem(eid)
+        self.assertEqual(self.q.Pop(), "event1")
+        self.assertIsNone(item.Value)
+        eid2 = self.q.Insert("event2", vrtime.create_time(20, 1))
+        self.assertIs(self.q.GetItem(eid2), item)
+        self.assertEqual(item.itemID, eid2)
+        self.assertEqual(item.Value, "event2")
+        self.assertFalse(item.Cancel)
+        self.assertFalse(hasattr(item, "__dict__"))
+
+class TestEventQueueJIT(unittest.TestCase):
+    def setUp(self):
+        self.q = EventQueueJIT.New()
+
+    def test_pop_order(self):
+        self.q.Insert("c", vrtime.create_time(5, 2))
+        self.q.Insert("a", vrtime.create_time(3, 7))
+        self.q.Insert("b", vrtime.create_time(5, 1))
+        self.q.Insert("d", vrtime.create_time(5, 2))
+        self.assertEqual(self.q.MinTicks(), 3)
+        self.assertEqual([self.q.Pop() for _ in range(4)], ["a", "b", "c", "d"])
+        self.assertIsNone(self.q.Pop())
+        self.assertEqual(self.q.MinTime().Ticks(), 0)
+
+    def test_update_and_remove(self):
+        eid1 = self.q.Insert("event1", vrtime.create_time(10, 1))
+        eid2 = self.q.Insert("event2", vrtime.create_time(15, 1))
+        self.q.UpdateTime(eid1, vrtime.create_time(20, 1))
+        self.q.UpdateTime(eid1, vrtime.create_time(10, 1))
+        self.assertEqual(self.q.Len(), 2)
+        self.assertTrue(self.q.Remove(eid2))
+        self.assertFalse(self.q.Remove(eid2))
+        self.assertEqual(self.q.GetItem(eid1).Time.Ticks(), 10)
+        self.assertEqual(self.q.Pop(), "event1")
+        self.assertEqual(self.q.Len(), 0)
+
+    def test_argsort_events(self):
+        rng = random.Random(2)
+        times = [(rng.randint(0, 20), rng.randint(-2, 2)) for _ in range(200)]
+        ticks = np.array([t for t, _ in times], dtype=np.int64)
+        pris = np.array([p for _, p in times], dtype=np.int64)
+        order = argsort_events(ticks, pris).tolist()
+        self.assertEqual(order, sorted(range(len(times)), key=lambda i: (times[i], i)))
+
+    def test_zero_capacity(self):
+        q = EventQueueJIT(capacity=0)
+        q.Insert("a", vrtime.create_time(1, 1))
+        q.Insert("b", vrtime.create_time(0, 1))
+        self.assertEqual([q.Pop(), q.Pop()], ["b", "a"])
+
+    @unittest.skipUnless(numba, "numba is not installed")
+    def test_compiled_kernels(self):
+        from numba.core.registry import CPUDispatcher
+        for kernel in (nq_push, nq_pop, argsort_events):
+            self.assertIsInstance(kernel, CPUDispatcher)
+        keys = [(5, 2, 1), (3, 7, 2), (5, 1, 3), (5, 2, 4)]
+        ticks, pris, ids = (np.empty(len(keys), dtype=np.int64) for _ in range(3))
+        n = 0
+        for t, p, i in keys:
+            n = nq_push(ticks, pris, ids, n, t, p, i)
+        popped = []
+        while n:
+            popped.append(int(ids[0]))
+            n = nq_pop(ticks, pris, ids, n)
+        self.assertEqual(popped, [2, 3, 1, 4])
+        order = argsort_events(np.array([5, 3, 5], dtype=np.int64), np.array([2, 7, 1], dtype=np.int64))
+        self.assertEqual(order.tolist(), [1, 2, 0])
+
+    def test_matches_event_queue(self):
+        # the array heap must dispatch in the same order as EventQueue, including past its initial capacity
+        rng = random.Random(1)
+        ref, jit = EventQueue.New(), EventQueueJIT(capacity=4)
+        ids = []
+        for i in range(300):
+            ticks, pri = rng.randint(0, 50), rng.randint(0, 3)
+            ids.append(ref.Insert(i, vrtime.create_time(ticks, pri)))
+            self.assertEqual(jit.Insert(i, vrtime.create_time(ticks, pri)), ids[-1])
+        for eid in rng.sample(ids, 100):
+            self.assertEqual(ref.Remove(eid), jit.Remove(eid))
+        for eid in rng.sample(ids, 100):
+            ticks = rng.randint(0, 50)
+            ref.UpdateTime(eid, vrtime.create_time(ticks, 1))
+            jit.UpdateTime(eid, vrtime.create_time(ticks, 1))
+        self.assertEqual(ref.Len(), jit.Len())
+        while ref.Len():
+            self.assertEqual(ref.MinTicks(), jit.MinTicks())
+            self.assertEqual(ref.Pop(), jit.Pop())
+        self.assertIsNone(jit.Pop())
+
+class TestEventQueueSPSC(unittest.TestCase):
+    def test_push_pop(self):
+        q = EventQueueSPSC.New(3)
+        self.assertEqual(len(q.buf), 4)
+        self.assertIsNone(q.Pop())
+        self.assertFalse(q.Wait(0))
+        for i in range(4):
+            self.assertTrue(q.Push(i))
+        self.assertFalse(q.Push(4))
+        self.assertEqual(q.Len(), 4)
+        self.assertTrue(q.Wait(0))
+        self.assertEqual([q.Pop(), q.Pop()], [0, 1])
+        # wrap around the end of the ring
+        self.assertTrue(q.Push(4))
+        self.assertTrue(q.Push(5))
+        self.assertEqual([q.Pop() for _ in range(4)], [2, 3, 4, 5])
+        self.assertIsNone(q.Pop())
+
+    def test_producer_consumer(self):
+        q = EventQueueSPSC.New(8)
+        n = 2000
+        def produce():
+            for i in range(n):
+                while not q.Push(i):
+                    pytime.sleep(0)
+        producer = threading.Thread(target=produce)
+        producer.start()
+        received = []
+        while len(received) < n:
+            self.assertTrue(q.Wait(5))
+            v = q.Pop()
+            while v is not None:
+                received.append(v)
+                v = q.Pop()
+        producer.join(5)
+        self.assertEqual(received, list(range(n)))
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,10 @@
+import os
+import subprocess
+import sys
 import unittest
 import numpy as np
 import evt.vrtime as vrtime
+from evt.vrtime_soa import EventTimes
 
 class TestVrTime(unittest.TestCase):
     def setUp(self):
@@ -26,6 +30,18 @@ class TestVrTime(unittest.TestCase):
         self.assertEqual(t.TimeStr(), f"(20,5)")
         self.assertTrue(isinstance(t.SecondsStr(), str))
 
+    def test_plain_int_fields(self):
+        t = vrtime.create_time(np.int64(10), np.int64(2))
+        self.assertIs(type(t.TickCnt), int)
+        self.assertIs(type(t.Pri()), int)
+        t.SetTicks(np.int64(20))
+        self.assertIs(type(t.Ticks()), int)
+        self.assertIs(type(t.Plus(vrtime.create_time(1, 1)).Ticks()), int)
+        self.assertIs(type(vrtime.seconds_to_ticks(np.float64(1.5))), int)
+        self.assertIs(type(vrtime.ticks_to_seconds(15)), float)
+        self.assertIs(type(vrtime.TicksPerSecond), int)
+        self.assertFalse(hasattr(t, "__dict__"))
+
     def test_seconds_to_time_and_ticks(self):
         t = vrtime.seconds_to_time(np.float64(1.0))
         ticks = vrtime.seconds_to_ticks(np.float64(1.0))
@@ -33,6 +49,27 @@ class TestVrTime(unittest.TestCase):
         t2 = vrtime.seconds_to_time_pri(np.float64(1.0), np.int64(7))
         self.assertEqual(t2.Pri(), np.int64(7))
 
+    def test_seconds_to_ticks_rounding(self):
+        # halves round away from zero, as Go's math.Round does
+        vrtime.set_ticks_per_second(1)
+        for sec, ticks in ((0.5, 1), (1.5, 2), (2.5, 3), (2.4999, 2), (-0.5, -1), (-2.5, -3), (-2.4999, -2), (0.0, 0)):
+            self.assertEqual(vrtime.seconds_to_ticks(sec), ticks)
+        self.assertEqual(vrtime.mu_seconds_to_ticks(2.5e6), 3)
+        # values of 2**52 and above are already whole and must come back unchanged
+        big = float(2**52 + 1)
+        self.assertEqual(vrtime.seconds_to_ticks(big), 2**52 + 1)
+        self.assertEqual(vrtime.seconds_to_ticks(0.49999999999999994), 0)
+
+    def test_array_conversions(self):
+        secs = np.array([0.0, 1.25e-10, 2.5e-10, -2.5e-10, 1.23456789, 3.0])
+        ticks = vrtime.seconds_to_ticks_array(secs)
+        self.assertEqual(ticks.dtype, np.int64)
+        self.assertEqual(ticks.tolist(), [vrtime.seconds_to_ticks(x) for x in secs])
+        back = vrtime.ticks_to_seconds_array(ticks)
+        self.assertEqual(back.dtype, np.float64)
+        self.assertEqual(back.tolist(), [vrtime.ticks_to_seconds(int(x)) for x in ticks])
+        self.assertEqual(vrtime.seconds_to_ticks_array([1e-9, 2e-9]).tolist(), [10, 20])
+
     def test_mu_seconds_to_ticks(self):
         vrtime.set_ticks_per_second(np.int64(1e6))
         ticks = vrtime.mu_seconds_to_ticks(np.float64(1.0))
@@ -66,6 +103,44 @@ class TestVrTime(unittest.TestCase):
         self.assertTrue(t2.GE(t1))
         self.assertTrue(t2.GE(t2))
         self.assertTrue(t1.NEQ(t2))
+        # ticks dominate priority, and comparisons are consistent with cmp_time
+        t4 = vrtime.create_time(np.int64(4), np.int64(9))
+        self.assertTrue(t4.LT(t1))
+        self.assertFalse(t3.LE(t2))
+        self.assertFalse(t1.GE(t2))
+        self.assertFalse(t1.NEQ(vrtime.create_time(5, 1)))
+        for a in (t1, t2, t3, t4):
+            for b in (t1, t2, t3, t4):
+                c = vrtime.cmp_time(a, b)
+                self.assertEqual((a.LT(b), a.EQ(b), a.GT(b)), (c == -1, c == 0, c == 1))
+
+    def test_format_times(self):
+        ticks = np.array([20, 5, 0], dtype=np.int64)
+        pris = np.array([5, 1, 0], dtype=np.int64)
+        self.assertEqual(vrtime.format_times(ticks, pris),
+                         [vrtime.create_time(t, p).TimeStr() for t, p in zip(ticks, pris)])
+        t = vrtime.create_time(15, 2)
+        self.assertEqual(t.SecondsStr(), f"({vrtime.time_to_seconds(t):e},2)")
+
+    def test_import_without_numpy(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        out = subprocess.run([sys.executable, "-c", "import sys, evt.evtm; print('numpy' in sys.modules)"],
+                             cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip(), "False")
+
+    def test_operators(self):
+        t1 = vrtime.create_time(5, 1)
+        t2 = vrtime.create_time(5, 2)
+        t3 = vrtime.create_time(6, 0)
+        self.assertTrue(t1 < t2 < t3)
+        self.assertTrue(t3 > t1 and t2 >= t2 and t1 <= t2)
+        self.assertEqual(t1, vrtime.create_time(5, 1))
+        self.assertNotEqual(t1, t2)
+        self.assertEqual(sorted([t3, t2, t1]), [t1, t2, t3])
+        self.assertEqual(hash(t1), hash(vrtime.create_time(5, 1)))
+        self.assertEqual(len({t1, t2, vrtime.create_time(5, 1)}), 2)
+        with self.assertRaises(TypeError):
+            t1 < 5
 
     def test_plus(self):
         t1 = vrtime.create_time(np.int64(5), np.int64(3))
@@ -83,6 +158,40 @@ class TestVrTime(unittest.TestCase):
         self.assertEqual(z.Pri(), np.int64(0))
         self.assertEqual(inf.Ticks(), np.iinfo(np.int64).max)
         self.assertEqual(inf.Pri(), np.iinfo(np.int64).max)
+        self.assertIs(vrtime.zero_time(), z)
+        self.assertIs(vrtime.infinity_time(), inf)
+
+class TestEventTimes(unittest.TestCase):
+    def test_add_and_order(self):
+        times = EventTimes(capacity=2)
+        values = [(5, 2), (3, 9), (5, 1), (3, 9), (-1, 0)]
+        for i, (tick, pri) in enumerate(values):
+            self.assertEqual(times.add(tick, pri), i)
+        self.assertEqual(times.add_time(vrtime.create_time(4, 0)), 5)
+        self.assertEqual(len(times), 6)
+        self.assertEqual(times.sorted_indices().tolist(), [4, 1, 3, 5, 2, 0])
+        t = times.time(0)
+        self.assertEqual((t.Ticks(), t.Pri()), (5, 2))
+        self.assertIs(type(t.Ticks()), int)
+
+    def test_compare(self):
+        times = EventTimes()
+        a = times.add(5, 1)
+        b = times.add(5, 2)
+        c = times.add(6, 0)
+        for i in (a, b, c):
+            for j in (a, b, c):
+                self.assertEqual(times.compare(i, j), vrtime.cmp_time(times.time(i), times.time(j)))
+
+    def test_index_out_of_range(self):
+        times = EventTimes()
+        times.add(5, 1)
+        for idx in (1, 7, -1):
+            with self.assertRaises(IndexError):
+                times.time(idx)
+            with self.assertRaises(IndexError):
+                times.compare(0, idx)
+        self.assertEqual(EventTimes().sorted_indices().tolist(), [])
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,38 +4,58 @@
 #
 # This module defines and manages virtual time inside a simulator.
 # Time is tracked as an integral number of ticks since the epoch, along with a secondary sort value to provide for deterministic order among simultaneous events.
+#
+# Go's int64 and float64 are represented by plain Python int and float. Every Time operation is scalar work, for which
+# numpy scalars only add boxing and ufunc dispatch; note that Python ints do not wrap around at 64 bits as Go's do.
+# numpy is used where it pays, in the functions on whole arrays of times (seconds_to_ticks_array, ticks_to_seconds_array
+# and format_times). Those functions import it when called, so importing vrtime, evtq or evtm does not load numpy.
+#
+# Simulation time is carried in integer ticks: scheduling, ordering and advancing the clock all work on TickCnt. Conversion
+# to seconds is a float division and belongs at the boundaries -- reading user input, reporting, tracing -- and for
+# many times at once, ticks_to_seconds_array converts a whole array in one call.
+
+from __future__ import annotations
 
-import numpy as np
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 # SecondPerTick gives a float64 representation of the tick size in seconds. Default 0.1 ns
-SecondPerTick = np.float64(1e-10)
+SecondPerTick = 1e-10
 
 # TicksPerSecond specifies the frequency of the ticker. Default is 1e9.
-TicksPerSecond = np.int64(1.0 / np.float64(1e-10))
+TicksPerSecond = int(1.0 / 1e-10)
 
 # FloatTicksPerSecond gives a float64 representation of the number of ticks a second has
-FloatTicksPerSecond = np.float64(np.int64(1.0 / np.float64(1e-10)))
+FloatTicksPerSecond = float(int(1.0 / 1e-10))
 
 # NanoSecPerTick gives a float64 representation of the tick size in nanoseconds
-NanoSecPerTick = np.int64(np.float64(1e9) * np.float64(1e-10))
+NanoSecPerTick = int(1e9 * 1e-10)
 
 # TickValue gives the size of a tick, in seconds
-TickValue = np.float64(1e-10)
+TickValue = 1e-10
+
+# maxInt64 is the largest value of Go's int64, used for InfinityTime
+maxInt64 = (1 << 63) - 1
 
 
-def set_ticks_per_second(tps: np.int64) -> bool:
+# The conversion functions below read FloatTicksPerSecond from the module at each call, so that a change made by
+# set_ticks_per_second is seen at once. It is one global load per call, which CPython caches, so the constant is not
+# bound into the functions as a default argument or held in a separate container.
+def set_ticks_per_second(tps: int) -> bool:
     """
     Changes the value of TicksPerSecond (the frequency of the ticker) and the associated values
     FloatTicksPerSecond and TickValue. The default value is 1e7.
     """
     global TicksPerSecond, FloatTicksPerSecond, SecondPerTick, NanoSecPerTick, TickValue
-    TicksPerSecond = np.int64(tps)
-    FloatTicksPerSecond = np.float64(tps)
-    SecondPerTick = np.float64(1.0) / FloatTicksPerSecond
-    NanoSecPerTick = np.int64(np.float64(1e9) * SecondPerTick)
-    TickValue = np.float64(1.0) / FloatTicksPerSecond
+    TicksPerSecond = int(tps)
+    FloatTicksPerSecond = float(tps)
+    SecondPerTick = 1.0 / FloatTicksPerSecond
+    NanoSecPerTick = int(1e9 * SecondPerTick)
+    TickValue = 1.0 / FloatTicksPerSecond
     return True
 
 
@@ -43,18 +63,55 @@ def set_ticks_per_second(tps: np.int64) -> bool:
 # of time values -- smaller numbers happen earlier than larger numbers. In order to provide determinism, the order in
 # which simultaneous events occur is specified by Priority -- among simultaneous events, smaller numbers for Priority
 # occur before larger numbers.
+# A simulation creates a Time per scheduled event, so Time declares __slots__ rather than carrying a per-instance __dict__.
+# Time also supports Python's comparison operators and hashing with the same ordering as LT, EQ and the rest, so Times
+# can be compared with <, sorted, and pushed onto a heapq heap directly, and used as a dict key or set member.
+# Time is not frozen: SetTicks and SetPri are part of the Go API, and a frozen dataclass builds each instance
+# through object.__setattr__, more than doubling the cost of creating one. Instead, as Go passes Time by value,
+# evtq and evtm never modify a Time they are given, building a new one when they need a different value.
+# The hash changes with SetTicks and SetPri, so a Time must not be modified while it is a dict key or set member.
 @dataclass
 class Time:
-    TickCnt: np.int64
-    Priority: np.int64
+    __slots__ = ('TickCnt', 'Priority')
+    TickCnt: int
+    Priority: int
+
+
+    def __lt__(self, other: Time) -> bool:
+        if not isinstance(other, Time):
+            return NotImplemented
+        return self.TickCnt < other.TickCnt or (self.TickCnt == other.TickCnt and self.Priority < other.Priority)
+
+
+    def __le__(self, other: Time) -> bool:
+        if not isinstance(other, Time):
+            return NotImplemented
+        return self.TickCnt < other.TickCnt or (self.TickCnt == other.TickCnt and self.Priority <= other.Priority)
+
+
+    def __gt__(self, other: Time) -> bool:
+        if not isinstance(other, Time):
+            return NotImplemented
+        return self.TickCnt > other.TickCnt or (self.TickCnt == other.TickCnt and self.Priority > other.Priority)
+
 
+    def __ge__(self, other: Time) -> bool:
+        if not isinstance(other, Time):
+            return NotImplemented
+        return self.TickCnt > other.TickCnt or (self.TickCnt == other.TickCnt and self.Priority >= other.Priority)
 
-    def Ticks(self) -> np.int64:
+
+    def __hash__(self) -> int:
+        return hash((self.TickCnt, self.Priority))
+
+
+    def Ticks(self) -> int:
         """Returns the primary key of a Time data structure, usually used to describe a length of time (e.g. between events)"""
         return self.TickCnt
 
 
-    def Seconds(self) -> np.float64:
+    # slow path: a float division per call; code that works with many times should stay in ticks
+    def Seconds(self) -> float:
         """Returns the float64 representation of the primary key of a Time data structure, usually used to describe a length of time (e.g. between events)"""
         return ticks_to_seconds(self.TickCnt)
 
@@ -64,14 +121,14 @@ class Time:
         return self.Priority
 
 
-    def SetTicks(self, v: np.int64):
+    def SetTicks(self, v: int):
         """Sets the time associated with an event. N.b.: this does not modify the Priority."""
-        self.TickCnt = np.int64(v)
+        self.TickCnt = int(v)
 
 
-    def SetPri(self, p: np.int64):
+    def SetPri(self, p: int):
         """Sets the priority of an event. N.b. this does not modify the Ticks."""
-        self.Priority = np.int64(p)
+        self.Priority = int(p)
 
 
     def TimeStr(self) -> str:
@@ -81,49 +138,46 @@ class Time:
 
     def SecondsStr(self) -> str:
         """Returns a human-readable representation of a Time. The time is represented as fractional seconds rather than ticks."""
-        return f"({ticks_to_seconds(self.TickCnt):e},{self.Priority})"
+        return "(%e,%d)" % (self.TickCnt / FloatTicksPerSecond, self.Priority)
 
 
-    def LT(self, t1: 'Time') -> bool:
+    def LT(self, t1: Time) -> bool:
         """Returns True iff the receiver Time is less than the argument Time."""
-        return cmp_time(self, t1) == -1
+        return self.TickCnt < t1.TickCnt or (self.TickCnt == t1.TickCnt and self.Priority < t1.Priority)
 
 
-    def GT(self, t1: 'Time') -> bool:
+    def GT(self, t1: Time) -> bool:
         """Returns True iff the receiver Time is greater than the argument Time."""
-        return cmp_time(self, t1) == 1
+        return self.TickCnt > t1.TickCnt or (self.TickCnt == t1.TickCnt and self.Priority > t1.Priority)
 
 
-    def EQ(self, t1: 'Time') -> bool:
+    def EQ(self, t1: Time) -> bool:
         """Returns True iff the receiver Time is equal to the argument Time. Both ticks and priority have to be the same for True to be returned."""
-        return cmp_time(self, t1) == 0
+        return self.TickCnt == t1.TickCnt and self.Priority == t1.Priority
 
 
-    def LE(self, t1: 'Time') -> bool:
+    def LE(self, t1: Time) -> bool:
         """Returns True iff the receiver Time is less than or equal to the argument Time."""
-        return self.LT(t1) or self.EQ(t1)
+        return self.TickCnt < t1.TickCnt or (self.TickCnt == t1.TickCnt and self.Priority <= t1.Priority)
 
 
-    def GE(self, t1: 'Time') -> bool:
+    def GE(self, t1: Time) -> bool:
         """Returns True iff the receiver Time is greater than or equal to the argument Time."""
-        return self.GT(t1) or self.EQ(t1)
+        return self.TickCnt > t1.TickCnt or (self.TickCnt == t1.TickCnt and self.Priority >= t1.Priority)
 
 
-    def NEQ(self, t1: 'Time') -> bool:
+    def NEQ(self, t1: Time) -> bool:
         """Returns True iff the receiver time is not equal to the argument Time. Like all of the Time comparison functions, both the Ticks and the Priority are used."""
-        return not self.EQ(t1)
+        return self.TickCnt != t1.TickCnt or self.Priority != t1.Priority
 
 
-    def Plus(self, a: 'Time') -> 'Time':
+    def Plus(self, a: Time) -> Time:
         """Adds the receiver Time to the argument Time. When adding time, add the ticks and set the priority to be the dominant one."""
-        ticks = self.Ticks() + a.Ticks()
-        tPri = self.Pri()
-        aPri = a.Pri()
-        if tPri > aPri:
-            return Time(ticks, tPri)
-        return Time(ticks, aPri)
+        tPri = self.Priority
+        aPri = a.Priority
+        return Time(self.TickCnt + a.TickCnt, tPri if tPri > aPri else aPri)
     
-    def copy(self) -> 'Time':
+    def copy(self) -> Time:
         """Returns a new Time instance with the same TickCnt and Priority."""
         return Time(self.TickCnt, self.Priority)
 
@@ -131,77 +185,123 @@ class Time:
 # Utility functions
 
 # CreateTime creates a Time object.
-def create_time(ticks: np.int64, priority: np.int64) -> Time:
+def create_time(ticks: int, priority: int) -> Time:
     """Creates a Time object."""
-    return Time(np.int64(ticks), np.int64(priority))
+    return Time(int(ticks), int(priority))
 
 
 # SecondsToTime converts a fractional number of seconds into an equivalent Time value. The returned Priority is 0.
-def seconds_to_time(v: np.float64) -> Time:
+def seconds_to_time(v: float) -> Time:
     """Converts a fractional number of seconds into an equivalent Time value. The returned Priority is 0."""
     ticks = seconds_to_ticks(v)
-    return Time(ticks, np.int64(0))
+    return Time(ticks, 0)
 
 
 # SecondsToTimePri converts a fractional number of seconds into an equivalent Time value. The returned Priority is pri.
-def seconds_to_time_pri(v: np.float64, pri: np.int64) -> Time:
+def seconds_to_time_pri(v: float, pri: int) -> Time:
     """Converts a fractional number of seconds into an equivalent Time value. The returned Priority is pri."""
     ticks = seconds_to_ticks(v)
-    return Time(ticks, np.int64(pri))
+    return Time(ticks, int(pri))
 
 
 # SecondsToTicks converts a fractional number of seconds into a whole number of ticks.
-def seconds_to_ticks(v: np.float64) -> np.int64:
+# Like Go's math.Round, halves are rounded away from zero, where Python's round() would round them to even. The fraction
+# is taken against the truncated value, which is exact, rather than by adding 0.5, which can round up a large odd value.
+def seconds_to_ticks(v: float) -> int:
     """Converts a fractional number of seconds into a whole number of ticks."""
-    return np.int64(round(v * FloatTicksPerSecond))
+    t = v * FloatTicksPerSecond
+    ticks = int(t)
+    frac = t - ticks
+    if frac >= 0.5:
+        return ticks + 1
+    if frac <= -0.5:
+        return ticks - 1
+    return ticks
 
 
 # MuSecondsToTicks converts a fractional number of micro-seconds into a whole number of ticks.
-def mu_seconds_to_ticks(v: np.float64) -> np.int64:
+# Rounded as in seconds_to_ticks; the product is divided by 1e6 in the same order as in Go, so that results match it exactly.
+def mu_seconds_to_ticks(v: float) -> int:
     """Converts a fractional number of micro-seconds into a whole number of ticks."""
-    return np.int64(round(v * FloatTicksPerSecond / np.float64(1e6)))
+    t = v * FloatTicksPerSecond / 1e6
+    ticks = int(t)
+    frac = t - ticks
+    if frac >= 0.5:
+        return ticks + 1
+    if frac <= -0.5:
+        return ticks - 1
+    return ticks
 
 
 # TimeToSeconds converts a Time value into a fractional number of seconds. The Priority field is ignored.
-def time_to_seconds(t: Time) -> np.float64:
+def time_to_seconds(t: Time) -> float:
     """Converts a Time value into a fractional number of seconds. The Priority field is ignored."""
-    return np.float64(t.TickCnt) / FloatTicksPerSecond
+    return t.TickCnt / FloatTicksPerSecond
 
 
 # TicksToSeconds converts a whole number of ticks into a fractional number of seconds.
-def ticks_to_seconds(ticks: np.int64) -> np.float64:
+def ticks_to_seconds(ticks: int) -> float:
     """Converts a whole number of ticks into a fractional number of seconds."""
-    return np.float64(ticks) / FloatTicksPerSecond
+    return ticks / FloatTicksPerSecond
+
+
+# SecondsToTicksArray converts an array of fractional numbers of seconds into an int64 array of whole numbers of ticks.
+# Use seconds_to_ticks for one-off conversions and this for bulk ones, e.g. of generated inter-arrival times: the loop
+# runs inside numpy. Rounding matches seconds_to_ticks; numpy's rint would round halves to even.
+def seconds_to_ticks_array(v: np.ndarray) -> np.ndarray:
+    """Converts an array of fractional numbers of seconds into an int64 array of whole numbers of ticks."""
+    import numpy as np
+    t = np.asarray(v, dtype=np.float64) * FloatTicksPerSecond
+    ticks = np.trunc(t)
+    frac = t - ticks
+    ticks += frac >= 0.5
+    ticks -= frac <= -0.5
+    return ticks.astype(np.int64)
+
 
+# TicksToSecondsArray converts an array of whole numbers of ticks into a float64 array of fractional numbers of seconds.
+def ticks_to_seconds_array(ticks: np.ndarray) -> np.ndarray:
+    """Converts an array of whole numbers of ticks into a float64 array of fractional numbers of seconds."""
+    import numpy as np
+    return np.asarray(ticks, dtype=np.int64) / FloatTicksPerSecond
 
-# cmpTime is a utility function underlying all of the comparison operators.
+
+# FormatTimes gives the TimeStr representation of each of the times (ticks[i], pris[i]), for tracing many times at once.
+def format_times(ticks: np.ndarray, pris: np.ndarray) -> list:
+    """Returns a list with the TimeStr representation of each time (ticks[i], pris[i])."""
+    import numpy as np
+    # converting to lists of Python ints first and formatting those is faster than numpy's vectorized string functions
+    return [f"({t},{p})" for t, p in zip(np.asarray(ticks, dtype=np.int64).tolist(), np.asarray(pris, dtype=np.int64).tolist())]
+
+
+# cmpTime is a utility function implementing the ordering of Time values.
 # Uses standard unix-ish return of -1, 0, 1 to report 'lhs has higher priority', 'lhs and rhs are equal', 'lhs has smaller priority'.
-# Note that both Ticks and Priority participate in the comparison.
+# Note that both Ticks and Priority participate in the comparison: a Time orders as the tuple (TickCnt, Priority).
+# The comparison methods of Time do not call cmp_time; each compares the fields itself, TickCnt first and Priority only
+# on a tie, which takes one Python frame and no tuple allocations.
 def cmp_time(lhs: Time, rhs: Time) -> int:
     """Compares two Time values. Returns -1, 0, or 1 as in standard unix comparison."""
-    lhsTicks = lhs.Ticks()
-    rhsTicks = rhs.Ticks()
-    if lhsTicks < rhsTicks:
-        return -1
-    elif lhsTicks > rhsTicks:
-        return 1
-    lhsPri = lhs.Pri()
-    rhsPri = rhs.Pri()
-    if lhsPri < rhsPri:
-        return -1
-    elif lhsPri > rhsPri:
-        return 1
+    if lhs.TickCnt != rhs.TickCnt:
+        return -1 if lhs.TickCnt < rhs.TickCnt else 1
+    if lhs.Priority != rhs.Priority:
+        return -1 if lhs.Priority < rhs.Priority else 1
     return 0
 
 
+# zero_time and infinity_time return shared constants rather than building a new Time on each call.
+# Callers must not modify the returned Time with SetTicks or SetPri; use copy() to get one that may be modified.
+# For the same reason, state that starts at zero and may be modified later, such as a clock, starts from Time(0, 0).
+_ZERO_TIME = Time(0, 0)
+_INFINITY_TIME = Time(maxInt64, maxInt64)
+
+
 # ZeroTime returns a Time structure with value zero in both keys.
 def zero_time() -> Time:
-    """Returns a Time structure with value zero in both keys."""
-    return Time(np.int64(0), np.int64(0))
+    """Returns a Time structure with value zero in both keys. The Time is shared and must not be modified."""
+    return _ZERO_TIME
 
 
 # InfinityTime marks the end of time. Every other time in a running simulation is less than InfinityTime.
 def infinity_time() -> Time:
-    """Marks the end of time. Every other time in a running simulation is less than InfinityTime."""
-    maxint = np.iinfo(np.int64).max
-    return Time(np.int64(maxint), np.int64(maxint))
+    """Marks the end of time. Every other time in a running simulation is less than InfinityTime. The Time is shared and must not be modified."""
+    return _INFINITY_TIME
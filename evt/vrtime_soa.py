@@ -0,0 +1,66 @@
+# vrtime_soa.py: array-backed store of event times
+#
+# EventTimes holds many event times as two parallel int64 arrays of tick counts and priorities, indexed by the
+# position at which each time was added, rather than as one vrtime.Time object per event. Bulk operations over
+# all of the times, such as ordering them, are then done in numpy. Times are ordered as vrtime.Time orders
+# them: by tick count, then by priority; sorted_indices uses evtq_numba.argsort_events to do so.
+
+import numpy as np
+
+from evt.evtq_numba import argsort_events
+from evt.vrtime import Time
+
+
+class EventTimes:
+    """
+    EventTimes is a growable collection of event times stored as arrays
+    ticks: tick count of each time; only the first n entries are in use
+    pris: priority of each time; only the first n entries are in use
+    n: number of times added
+    """
+    def __init__(self, capacity: int = 1024):
+        self.ticks = np.empty(capacity, dtype=np.int64)
+        self.pris = np.empty(capacity, dtype=np.int64)
+        self.n = 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def add(self, tick: int, pri: int) -> int:
+        """Adds the time (tick, pri) to the collection and returns its index."""
+        idx = self.n
+        if idx == len(self.ticks):
+            capacity = 2 * max(idx, 1)
+            self.ticks = np.resize(self.ticks, capacity)
+            self.pris = np.resize(self.pris, capacity)
+        self.ticks[idx] = tick
+        self.pris[idx] = pri
+        self.n = idx + 1
+        return idx
+
+    def add_time(self, t: Time) -> int:
+        """Adds the value of a vrtime.Time to the collection and returns its index."""
+        return self.add(t.TickCnt, t.Priority)
+
+    def time(self, idx: int) -> Time:
+        """Returns the time at index idx as a vrtime.Time. The Time is a copy; modifying it does not change the collection."""
+        self._check(idx)
+        return Time(int(self.ticks[idx]), int(self.pris[idx]))
+
+    def compare(self, i: int, j: int) -> int:
+        """Compares the times at indices i and j. Returns -1, 0, or 1 as vrtime.cmp_time does."""
+        self._check(i)
+        self._check(j)
+        lhs = (self.ticks[i], self.pris[i])
+        rhs = (self.ticks[j], self.pris[j])
+        return int(lhs > rhs) - int(lhs < rhs)
+
+    def sorted_indices(self) -> np.ndarray:
+        """Returns the indices of all of the times in time order; equal times keep the order in which they were added."""
+        n = self.n
+        return argsort_events(self.ticks[:n], self.pris[:n])
+
+    def _check(self, idx: int):
+        """Raises IndexError unless idx is the index of a time in the collection; slots past n hold uninitialized memory."""
+        if not 0 <= idx < self.n:
+            raise IndexError(f"event time index {idx} out of range for {self.n} times")